@@ -0,0 +1,178 @@
+import json
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, request, current_app, abort
+from werkzeug.exceptions import HTTPException
+from models import Venue, Artist
+from queries import live, venue_areas, venue_detail, venue_version, artist_detail, artist_version, artist_list, show_list
+from search import search_names
+from scheduling import free_slots
+from counters import database_now
+from geo import nearby_args, nearby_venues
+from fulltext import search_all
+from pagination import Keyset, page_url
+from cache import cache, entity_tags
+from conditional import conditional, versioned
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API, version 1.
+#
+# The same data the HTML pages render, for clients that would otherwise
+# scrape the markup. Responses carry an ETag so a client can revalidate with
+# If-None-Match and get a bodiless 304 (answered from the row versions alone
+# on the detail endpoints), and they go through the same response cache, and
+# the same invalidation, as the pages.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+def paged(page):
+    return {
+        "data": page.items,
+        "next": page_url(after=page.next_cursor) if page.next_cursor else None,
+        "prev": page_url(before=page.prev_cursor) if page.prev_cursor else None,
+    }
+
+def search(model):
+    term = request.args.get('q', '')
+    return json_response(search_names(model, term, genre=request.args.get('genre')))
+
+# 404 is named explicitly: the app's HTML handler for that code would
+# otherwise win over a blueprint handler registered by class
+@api.errorhandler(404)
+@api.errorhandler(HTTPException)
+def http_error(error):
+    return json_response({"error": error.name, "status": error.code}, status=error.code)
+
+def routing_error(error):
+    # an unknown path, or a method a route does not take, fails before any
+    # blueprint is matched, so the app's 404/405 handlers pass it here.
+    # None outside /api/v1/
+    if request.path.startswith(api.url_prefix + '/'):
+        return http_error(error)
+    return None
+
+#  Search
+#  ----------------------------------------------------------------
+
+@api.route('/search')
+@conditional
+@cache.cached('Venue', 'Artist', 'Show')
+def full_text_search():
+    return json_response(search_all(request.args.get('q', '')))
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+@conditional
+@cache.cached('Venue', 'Show')
+def venues():
+    page = venue_areas(Keyset.from_request(current_app.config['PAGE_SIZE']), genre=request.args.get('genre'))
+    return json_response(paged(page))
+
+@api.route('/venues/search')
+@conditional
+@cache.cached('Venue', 'Show')
+def search_venues():
+    return search(Venue)
+
+@api.route('/venues/nearby')
+@conditional
+@cache.cached('Venue', 'Show')
+def nearby():
+    try:
+        query = nearby_args(request.args)
+    except (KeyError, ValueError):
+        abort(400)
+    return json_response(nearby_venues(**query))
+
+@api.route('/venues/<int:venue_id>')
+@versioned(venue_version)
+@cache.cached('Venue:{venue_id}', 'Venue:*', 'Artist:*')
+def venue(venue_id):
+    data = venue_detail(venue_id)
+    if data is None:
+        abort(404)
+    for show in data['upcoming_shows'] + data['past_shows']:
+        cache.add_tags(*entity_tags(Artist, show['artist_id']))
+    return json_response(data)
+
+def _datetime_arg(name, default):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        abort(400)
+    # naive UTC, like Show.start_time
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@api.route('/venues/<int:venue_id>/free-slots')
+def venue_free_slots(venue_id):
+    Venue.query.filter(Venue.id == venue_id, live(Venue)).first_or_404()
+    start = _datetime_arg('start', database_now().replace(second=0, microsecond=0))
+    end = _datetime_arg('end', start + timedelta(days=7))
+    duration = request.args.get('duration', 120, type=int)
+    if end <= start or end - start > timedelta(days=current_app.config['FREE_SLOTS_MAX_DAYS']) or duration <= 0:
+        abort(400)
+    slots = free_slots(venue_id, start, end, timedelta(minutes=duration))
+    return json_response({
+        "venue_id": venue_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "duration": duration,
+        "data": [{"start": slot_start.isoformat(), "end": slot_end.isoformat()} for slot_start, slot_end in slots],
+    })
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+@conditional
+@cache.cached('Artist')
+def artists():
+    page = artist_list(Keyset.from_request(current_app.config['PAGE_SIZE']), genre=request.args.get('genre'))
+    return json_response(paged(page))
+
+@api.route('/artists/search')
+@conditional
+@cache.cached('Artist', 'Show')
+def search_artists():
+    return search(Artist)
+
+@api.route('/artists/<int:artist_id>')
+@versioned(artist_version)
+@cache.cached('Artist:{artist_id}', 'Artist:*', 'Venue:*')
+def artist(artist_id):
+    data = artist_detail(artist_id)
+    if data is None:
+        abort(404)
+    for show in data['upcoming_shows'] + data['past_shows']:
+        cache.add_tags(*entity_tags(Venue, show['venue_id']))
+    return json_response(data)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+@conditional
+@cache.cached('Show', 'Venue', 'Artist')
+def shows():
+    page = show_list(Keyset.from_request(current_app.config['PAGE_SIZE']))
+    return json_response(paged(page))
@@ -0,0 +1,100 @@
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, current_app
+from sqlalchemy.exc import SQLAlchemyError
+from forms import ArtistForm, model_values
+from models import db, Venue, Artist
+from search import search_names
+from queries import genre_names, artist_detail, artist_version, artist_list
+from pagination import Keyset
+from cache import cache, entity_tags
+from conditional import versioned
+from routing import replica_reads
+
+#----------------------------------------------------------------------------#
+# Artist pages.
+#----------------------------------------------------------------------------#
+
+artists = Blueprint('artists', __name__)
+
+#  Listing and search
+#  ----------------------------------------------------------------
+
+@artists.route('/artists')
+@cache.cached('Artist')
+def index():
+    genre = request.args.get('genre')
+    page = artist_list(Keyset.from_request(current_app.config['PAGE_SIZE']), genre=genre)
+    return render_template('pages/artists.html', artists=page.items, page=page, genre=genre)
+
+@artists.route('/artists/search', methods=['POST'])
+@replica_reads
+def search_artists():
+    # case-insensitive partial match on artist name, e.g. "band" -> "The Wild Sax Band"
+    search_term = request.form.get('search_term', '')
+    response = search_names(Artist, search_term, genre=request.form.get('genre'))
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@artists.route('/artists/<int:artist_id>')
+@versioned(artist_version)
+@cache.cached('Artist:{artist_id}', 'Artist:*', 'Venue:*')
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    data = artist_detail(artist_id)
+    if data is None:
+        abort(404)
+    for show in data['upcoming_shows'] + data['past_shows']:
+        cache.add_tags(*entity_tags(Venue, show['venue_id']))
+    return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+
+@artists.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    artist = Artist.query.get_or_404(artist_id)
+    form = ArtistForm(obj=artist)
+    form.genres.data = genre_names(artist)
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@artists.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    artist = Artist.query.get_or_404(artist_id)
+    form = ArtistForm(request.form)
+    if not form.validate():
+        flash('An error occurred. Artist ' + artist.name + ' could not be updated.')
+        return render_template('forms/edit_artist.html', form=form, artist=artist)
+    try:
+        for name, value in model_values(form).items():
+            setattr(artist, name, value)
+        db.session.commit()
+        flash('Artist ' + artist.name + ' was successfully updated!')
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception('could not update artist %s', artist_id)
+        flash('An error occurred. Artist ' + form.name.data + ' could not be updated.')
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@artists.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+@artists.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    form = ArtistForm(request.form)
+    if not form.validate():
+        flash('An error occurred. Artist ' + request.form.get('name', '') + ' could not be listed.')
+        return render_template('forms/new_artist.html', form=form)
+    artist = Artist(**model_values(form))
+    try:
+        db.session.add(artist)
+        db.session.commit()
+        flash('Artist ' + artist.name + ' was successfully listed!')
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception('could not create artist')
+        flash('An error occurred. Artist ' + form.name.data + ' could not be listed.')
+    return render_template('pages/home.html')
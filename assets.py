@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#
+#   flask build-assets
+#
+# concatenates and minifies the stylesheet and script bundles below, copies
+# every other static file, names each output after its content hash under
+# static/dist/ and writes .gz (and .br, with the brotli package) next to it.
+# static/dist/manifest.json maps source names to the built ones:
+# url_for('static', filename='img/front-splash.jpg') and bundle_urls() in
+# templates pick the hashed name, which is served precompressed when the
+# client accepts it and cached as immutable for a year. Without a build,
+# everything falls back to the plain source files.
+#----------------------------------------------------------------------------#
+
+DIST = 'dist'
+
+# bundle name -> sources, in load order
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    'deferred.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.map', '.eot', '.ttf', '.otf')
+ONE_YEAR = 365 * 24 * 3600
+
+#  Build
+#  ----------------------------------------------------------------
+
+def minify_css(text):
+    # comments and runs of whitespace only; nothing that can change meaning
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    return text.replace(';}', '}').strip() + '\n'
+
+def minify_js(text, name):
+    # sources that already ship minified are left alone; the rest only lose
+    # full-line // comments and indentation, which is safe without a parser
+    if name.endswith('.min.js'):
+        return text.strip() + '\n'
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+def _hashed(name, content):
+    # bundles go straight into dist/, other files keep their directory
+    root, ext = os.path.splitext(name)
+    return '{}/{}.{}{}'.format(DIST, root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+def _write(static, name, content):
+    path = os.path.join(static, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if name.endswith(COMPRESSIBLE):
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, 9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(content))
+
+def _rewrite_urls(css, source, manifest):
+    # point url(...) references at the hashed copies. A reference that is not
+    # in the manifest is kept: bundles sit one level down in dist/ just like
+    # css/, so relative paths still resolve to the same file
+    def replace(match):
+        quote, url = match.groups()
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        if path.startswith(('data:', 'http:', 'https:', '//', '/')):
+            return match.group(0)
+        target = os.path.normpath(os.path.join(os.path.dirname(source), path)).replace(os.sep, '/')
+        if target not in manifest:
+            return match.group(0)
+        built = os.path.relpath(manifest[target], DIST).replace(os.sep, '/')
+        return 'url({0}{1}{2}{0})'.format(quote, built, suffix)
+    return re.sub(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)', replace, css)
+
+def build(static):
+    # earlier builds are left in place: pages rendered (or cached) before a
+    # deploy keep working while they still point at the old names
+    dist = os.path.join(static, DIST)
+    manifest = {}
+    for root, dirs, files in os.walk(static):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist)
+        for filename in sorted(files):
+            name = os.path.relpath(os.path.join(root, filename), static).replace(os.sep, '/')
+            with open(os.path.join(root, filename), 'rb') as f:
+                content = f.read()
+            manifest[name] = _hashed(name, content)
+            _write(static, manifest[name], content)
+    for bundle, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static, source), encoding='utf-8') as f:
+                text = f.read()
+            if bundle.endswith('.css'):
+                parts.append(minify_css(_rewrite_urls(text, source, manifest)))
+            else:
+                # a statement left open at the end of one file must not run
+                # into the next
+                parts.append(minify_js(text, source) + ';\n')
+        content = ''.join(parts).encode('utf-8')
+        manifest[bundle] = _hashed(bundle, content)
+        _write(static, manifest[bundle], content)
+    with open(os.path.join(dist, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+#  Serving
+#  ----------------------------------------------------------------
+
+class Assets:
+    def __init__(self, app=None):
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static = app.static_folder
+        self.load()
+        app.url_defaults(self._hashed_static_url)
+        app.view_functions['static'] = self.send_static
+        app.jinja_env.globals['bundle_urls'] = self.bundle_urls
+        app.extensions['assets'] = self
+
+    def load(self):
+        try:
+            with open(os.path.join(self.static, DIST, 'manifest.json')) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {}
+
+    def _hashed_static_url(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = self.manifest[values['filename']]
+
+    def bundle_urls(self, bundle):
+        # one hashed URL once built, otherwise the sources one by one
+        if bundle in self.manifest:
+            return [url_for('static', filename=bundle)]
+        return [url_for('static', filename=source) for source in BUNDLES[bundle]]
+
+    def send_static(self, filename):
+        if not filename.startswith(DIST + '/'):
+            return current_app.send_static_file(filename)
+        mimetype = mimetypes.guess_type(filename)[0]
+        response = None
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[encoding] and os.path.isfile(os.path.join(self.static, filename + suffix)):
+                response = send_from_directory(self.static, filename + suffix, mimetype=mimetype, max_age=ONE_YEAR)
+                response.content_encoding = encoding
+                break
+        if response is None:
+            response = send_from_directory(self.static, filename, mimetype=mimetype, max_age=ONE_YEAR)
+        if filename.endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        # the name changes whenever the content does
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets():
+    """Bundle, minify, fingerprint and precompress the static files."""
+    manifest = build(current_app.static_folder)
+    assets.load()
+    click.echo('Built {} assets into {}/{}/'.format(len(manifest), os.path.basename(current_app.static_folder), DIST))
@@ -0,0 +1,48 @@
+# Per-call cost of the `datetime` Jinja filter.
+#
+#   python bench/datetime_filter.py
+#
+# Compares the original dateutil + babel.dates.format_datetime filter with the
+# current one on an ISO string without the memo (cold), a repeated ISO string
+# (memo hit) and a native datetime.
+
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import babel.dates
+import dateutil.parser
+from templating import format_datetime
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+def per_call(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+def main(number=20000):
+    value = '2019-05-21T21:30:00.000Z'
+    native = datetime(2019, 5, 21, 21, 30)
+    assert format_datetime(value, 'full') == legacy_format_datetime(value, 'full')
+    assert format_datetime(native) == legacy_format_datetime(native.isoformat())
+
+    cold = format_datetime.__wrapped__
+    results = [
+        ('legacy, ISO string', per_call(lambda: legacy_format_datetime(value, 'full'), number // 10)),
+        ('current, ISO string, no memo', per_call(lambda: cold(value, 'full'), number)),
+        ('current, datetime, no memo', per_call(lambda: cold(native, 'full'), number)),
+        ('current, memo hit', per_call(lambda: format_datetime(value, 'full'), number)),
+    ]
+    for name, micros in results:
+        print(f'{name:32} {micros:8.2f} us/call')
+
+if __name__ == '__main__':
+    main()
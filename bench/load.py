@@ -0,0 +1,245 @@
+# Route throughput and latency under a scripted request mix.
+#
+#   python bench/load.py --target client --requests 5000 > client.json
+#   python bench/load.py --target server --concurrency 8 --duration 30 > server.json
+#   python bench/load.py --target http://127.0.0.1:8000 --concurrency 16 --baseline server.json
+#
+# Drives a weighted mix of the listing, detail, search and create routes
+# against the database in DATABASE_URL (seed it with bench/seed.py first),
+# either in-process through the Flask test client, through a threaded WSGI
+# server started here, or against an already running server such as
+# gunicorn. Prints p50/p95/p99 latency and requests/sec per route as JSON;
+# with --baseline it also reports the change against an earlier run.
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+SEARCH_TERMS = ['blue', 'sax', 'the', 'hall', 'velvet', 'owl', 'band', 'lounge', 'electric', 'no such name']
+GENRES = ['Jazz', 'Blues', 'Rock n Roll', 'Folk', 'Classical']
+
+def build_mix(venue_ids, artist_ids):
+    # (route, weight, request builder); a builder returns (method, path, form)
+    venue = lambda rng: rng.choice(venue_ids)
+    artist = lambda rng: rng.choice(artist_ids)
+    return [
+        ('venues', 10, lambda rng: ('GET', '/venues', None)),
+        ('venues?genre', 5, lambda rng: ('GET', '/venues?' + urlencode({'genre': rng.choice(GENRES)}), None)),
+        ('artists', 10, lambda rng: ('GET', '/artists', None)),
+        ('shows', 10, lambda rng: ('GET', '/shows', None)),
+        ('show_venue', 20, lambda rng: ('GET', '/venues/{}'.format(venue(rng)), None)),
+        ('show_artist', 20, lambda rng: ('GET', '/artists/{}'.format(artist(rng)), None)),
+        ('search_venues', 6, lambda rng: ('POST', '/venues/search', {'search_term': rng.choice(SEARCH_TERMS)})),
+        ('search_artists', 6, lambda rng: ('POST', '/artists/search', {'search_term': rng.choice(SEARCH_TERMS)})),
+        ('api_venue', 8, lambda rng: ('GET', '/api/v1/venues/{}'.format(venue(rng)), None)),
+        ('create_show', 3, lambda rng: ('POST', '/shows/create', {
+            'artist_id': artist(rng),
+            'venue_id': venue(rng),
+            'start_time': (datetime.now() + timedelta(days=rng.randrange(1, 365))).strftime('%Y-%m-%d %H:%M:%S'),
+        })),
+        ('create_venue', 2, lambda rng: ('POST', '/venues/create', {
+            'name': 'Bench Venue {}'.format(rng.randrange(10 ** 6)),
+            'city': 'Austin',
+            'state': 'TX',
+            'address': '1 Bench Street',
+            'genres': 'Jazz',
+            'facebook_link': 'https://www.facebook.com/bench',
+        })),
+    ]
+
+#  Clients
+#  ----------------------------------------------------------------
+
+class TestClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form):
+        response = self.client.open(path, method=method, data=form)
+        response.close()
+        return response.status_code
+
+
+class HTTPClient:
+    # one keep-alive connection per worker thread
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+
+    def request(self, method, path, form):
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            self.connection.close()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        response.read()
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+        return response.status
+
+#  Runner
+#  ----------------------------------------------------------------
+
+def percentile(sorted_values, fraction):
+    # nearest rank
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def worker(client, mix, rng, deadline, remaining, results, lock):
+    weights = [route[1] for route in mix]
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    while time.perf_counter() < deadline:
+        with lock:
+            if remaining[0] == 0:
+                break
+            remaining[0] -= 1
+        name, weight, build = rng.choices(mix, weights)[0]
+        method, path, form = build(rng)
+        started = time.perf_counter()
+        try:
+            status = client.request(method, path, form)
+        except Exception:
+            status = None
+        samples[name].append(time.perf_counter() - started)
+        if status is None or status >= 400:
+            errors[name] += 1
+    with lock:
+        for name, values in samples.items():
+            results['samples'][name].extend(values)
+        for name, count in errors.items():
+            results['errors'][name] += count
+
+def summarize(samples, errors, elapsed):
+    def stats(values, errors):
+        values = sorted(values)
+        return {
+            'requests': len(values),
+            'errors': errors,
+            'rps': round(len(values) / elapsed, 1),
+            'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+        }
+    routes = {name: stats(values, errors.get(name, 0)) for name, values in sorted(samples.items())}
+    everything = [value for values in samples.values() for value in values]
+    return routes, stats(everything, sum(errors.values())) if everything else None
+
+def compare(report, baseline):
+    # relative change of each metric against the baseline run; positive
+    # latency / negative rps changes are regressions
+    changes = {}
+    for name, current in report['routes'].items():
+        before = baseline.get('routes', {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: round((current[metric] - before[metric]) / before[metric] * 100, 1)
+            for metric in ('rps', 'p50_ms', 'p95_ms', 'p99_ms') if before.get(metric)
+        }
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Fyyur routes.')
+    parser.add_argument('--target', default='client',
+                        help="'client' (Flask test client), 'server' (threaded WSGI server started here) or a base URL")
+    parser.add_argument('--concurrency', type=int, default=1, help='worker threads (client target: always 1)')
+    parser.add_argument('--requests', type=int, default=2000, help='stop after this many requests')
+    parser.add_argument('--duration', type=float, default=60.0, help='stop after this many seconds')
+    parser.add_argument('--warmup', type=int, default=50, help='requests to run before measuring')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-cache', action='store_true', help='run with CACHE_TYPE=null')
+    parser.add_argument('--baseline', type=argparse.FileType('r'), help='earlier JSON report to compare with')
+    parser.add_argument('--fail-on-errors', action='store_true', help='exit non-zero if any request failed')
+    args = parser.parse_args()
+
+    # config.py reads the environment at import time
+    if args.no_cache:
+        os.environ['CACHE_TYPE'] = 'null'
+    from app import create_app
+    from models import db, Venue, Artist
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    app = create_app({'WTF_CSRF_ENABLED': False})
+    with app.app_context():
+        venue_ids = [id for id, in db.session.query(Venue.id)]
+        artist_ids = [id for id, in db.session.query(Artist.id)]
+    if not venue_ids or not artist_ids:
+        parser.error('the database is empty; run bench/seed.py first')
+    mix = build_mix(venue_ids, artist_ids)
+
+    server = None
+    if args.target == 'client':
+        args.concurrency = 1
+        make_client = lambda: TestClient(app)
+    else:
+        base_url = args.target
+        if args.target == 'server':
+            server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+        make_client = lambda: HTTPClient(base_url)
+
+    lock = threading.Lock()
+    warmup = {'samples': defaultdict(list), 'errors': defaultdict(int)}
+    worker(make_client(), mix, random.Random(args.seed - 1), float('inf'), [args.warmup], warmup, lock)
+
+    results = {'samples': defaultdict(list), 'errors': defaultdict(int)}
+    remaining = [args.requests]
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(make_client(), mix, random.Random(args.seed + i), deadline, remaining, results, lock))
+        for i in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if server is not None:
+        server.shutdown()
+
+    routes, total = summarize(results['samples'], results['errors'], elapsed)
+    report = {
+        'target': 'server' if args.target == 'server' else args.target,
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].rsplit('@', 1)[-1],
+        'cache': app.config['CACHE_TYPE'],
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'elapsed_s': round(elapsed, 2),
+        'total': total,
+        'routes': routes,
+    }
+    if args.baseline:
+        report['change_pct'] = compare(report, json.load(args.baseline))
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    if args.fail_on_errors and total and total['errors']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+# Synthetic catalog for the load tests.
+#
+#   DATABASE_URL=postgresql://localhost/fyyur_bench python bench/seed.py
+#   DATABASE_URL=sqlite:////tmp/bench.db python bench/seed.py --scale 0.01
+#
+# Appends artists, venues and shows to the configured database (creating the
+# tables if needed) with Core executemany batches. The default scale is the
+# production-sized catalog: 100k artists, 20k venues and 2M shows. Shows
+# start in the evening, lean towards weekends and are spread over the past
+# three years with a thinner year of upcoming dates, so the upcoming/past
+# split looks like a live site. --seed makes a run reproducible.
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from forms import GENRES
+from models import db, Genre, Venue, Artist, Show, venue_genres, artist_genres
+from cache import cache, bulk_tags
+from search import reset_index
+from scheduling import reset_bookings
+from counters import recount
+from fulltext import rebuild as rebuild_search
+
+ADJECTIVES = [
+    'Blue', 'Velvet', 'Golden', 'Electric', 'Midnight', 'Wild', 'Silver', 'Crimson', 'Lucky', 'Broken',
+    'Hollow', 'Neon', 'Rusty', 'Quiet', 'Roaring', 'Painted', 'Lonely', 'Little', 'Grand', 'Secret',
+]
+NOUNS = [
+    'Note', 'Room', 'Owl', 'Sax', 'Petals', 'Pianos', 'Whistle', 'Anchor', 'Harbor', 'Garden',
+    'Lantern', 'Engine', 'Canyon', 'River', 'Fox', 'Parlor', 'Circus', 'Orchard', 'Tavern', 'Mirror',
+]
+VENUE_KINDS = ['Hall', 'Lounge', 'Bar', 'Club', 'Theatre', 'Coffee House', 'Ballroom', 'Stage']
+ARTIST_KINDS = ['Band', 'Trio', 'Quartet', 'Collective', 'Orchestra', 'Project', 'Ensemble', 'Brothers']
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('New York', 'NY'), ('Brooklyn', 'NY'),
+    ('Austin', 'TX'), ('Houston', 'TX'), ('Chicago', 'IL'), ('Seattle', 'WA'), ('Portland', 'OR'),
+    ('Nashville', 'TN'), ('New Orleans', 'LA'), ('Denver', 'CO'), ('Atlanta', 'GA'), ('Boston', 'MA'),
+    ('Detroit', 'MI'), ('Minneapolis', 'MN'), ('Miami', 'FL'), ('Philadelphia', 'PA'),
+]
+
+BATCH_SIZE = 10000
+
+def _name(rng, kinds, n):
+    name = '{} {} {}'.format(rng.choice(ADJECTIVES), rng.choice(NOUNS), rng.choice(kinds))
+    if rng.random() < 0.3:
+        name = 'The ' + name
+    # keep names unique enough for the trigram index to have work to do
+    return '{} {}'.format(name, n) if rng.random() < 0.5 else name
+
+def _start_time(rng, now):
+    # three years back, one year ahead, busier closer to today
+    days = int(rng.triangular(-3 * 365, 365, 0))
+    day = (now + timedelta(days=days)).date()
+    if day.weekday() < 4 and rng.random() < 0.4:
+        day += timedelta(days=4 - day.weekday())
+    hour = rng.choice([18, 19, 19, 20, 20, 20, 21, 21, 22, 23])
+    return datetime(day.year, day.month, day.day, hour, rng.choice([0, 0, 15, 30, 30, 45]))
+
+def _owners(rng, n, kinds, extra, now):
+    for i in range(n):
+        city, state = rng.choice(CITIES)
+        row = {
+            'name': _name(rng, kinds, i),
+            'city': city,
+            'state': state,
+            'phone': '{:03d}-{:03d}-{:04d}'.format(rng.randrange(200, 999), rng.randrange(1000), rng.randrange(10000)),
+            'image_link': 'https://images.example.com/{}.jpg'.format(rng.randrange(10 ** 9)),
+            'facebook_link': 'https://www.facebook.com/{}'.format(rng.randrange(10 ** 9)),
+            'website_link': None,
+            'seeking_description': None,
+            'updated_at': now,
+        }
+        row.update(extra(rng, i))
+        yield row
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def insert_owners(model, links, owner_column, rows, genre_ids, rng):
+    # ids are read back after each batch so the genre links can be written
+    # without reserving ids up front
+    total = 0
+    for batch in _batches(rows):
+        start = db.session.query(db.func.coalesce(db.func.max(model.id), 0)).scalar()
+        db.session.execute(model.__table__.insert(), batch)
+        ids = [id for id, in db.session.query(model.id).filter(model.id > start).order_by(model.id)]
+        db.session.execute(links.insert(), [
+            {owner_column: id, 'genre_id': genre_id}
+            for id in ids
+            for genre_id in rng.sample(genre_ids, rng.choice([1, 1, 2, 2, 3]))
+        ])
+        db.session.commit()
+        total += len(batch)
+    return total
+
+def insert_shows(n, venue_ids, artist_ids, rng, now):
+    # a few venues and artists are far busier than the rest. Every show
+    # starts in the evening and is over by the next afternoon, so one show
+    # per venue and per artist a day keeps the bookings from overlapping,
+    # which PostgreSQL's exclusion constraints would refuse
+    booked = set()
+    def shows():
+        made = 0
+        while made < n:
+            venue_id = venue_ids[min(int(rng.paretovariate(1.2)) - 1, len(venue_ids) - 1)] \
+                if rng.random() < 0.2 else rng.choice(venue_ids)
+            artist_id = rng.choice(artist_ids)
+            start_time = _start_time(rng, now)
+            # (owner, day) packed into one int; artists negative
+            day = start_time.toordinal()
+            venue_day, artist_day = venue_id * 10 ** 6 + day, -(artist_id * 10 ** 6 + day)
+            if venue_day in booked or artist_day in booked:
+                continue
+            booked.update((venue_day, artist_day))
+            made += 1
+            yield {
+                'venue_id': venue_id,
+                'artist_id': artist_id,
+                'start_time': start_time,
+                'end_time': start_time + timedelta(minutes=rng.choice([60, 90, 120, 120, 150, 180])),
+                'updated_at': now,
+            }
+    total = 0
+    for batch in _batches(shows()):
+        db.session.execute(Show.__table__.insert(), batch)
+        db.session.commit()
+        total += len(batch)
+        print('  {} shows'.format(total), file=sys.stderr)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a synthetic Fyyur catalog.')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier on the default catalog size')
+    parser.add_argument('--artists', type=int, default=100000)
+    parser.add_argument('--venues', type=int, default=20000)
+    parser.add_argument('--shows', type=int, default=2000000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    counts = {kind: max(1, int(getattr(args, kind) * args.scale)) for kind in ('artists', 'venues', 'shows')}
+    started = time.perf_counter()
+    with create_app().app_context():
+        db.create_all()
+        genres = Genre.by_names(GENRES)
+        db.session.commit()
+        genre_ids = [genre.id for genre in genres]
+        insert_owners(Venue, venue_genres, 'venue_id', _owners(rng, counts['venues'], VENUE_KINDS, lambda rng, i: {
+            'address': '{} {} Street'.format(rng.randrange(1, 3000), rng.choice(NOUNS)),
+            'seeking_talent': rng.random() < 0.3,
+        }, now), genre_ids, rng)
+        insert_owners(Artist, artist_genres, 'artist_id', _owners(rng, counts['artists'], ARTIST_KINDS, lambda rng, i: {
+            'seeking_venue': rng.random() < 0.3,
+        }, now), genre_ids, rng)
+        venue_ids = [id for id, in db.session.query(Venue.id).order_by(Venue.id)]
+        artist_ids = [id for id, in db.session.query(Artist.id).order_by(Artist.id)]
+        insert_shows(counts['shows'], venue_ids, artist_ids, rng, now)
+        # one pass over the shows instead of a counter UPDATE per batch
+        recount()
+        rebuild_search()
+        cache.invalidate(bulk_tags(Venue, Artist, Show))
+        reset_index(Venue)
+        reset_index(Artist)
+        reset_bookings()
+    print('Seeded {venues} venues, {artists} artists and {shows} shows in {:.0f}s'.format(
+        time.perf_counter() - started, **counts), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
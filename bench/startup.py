@@ -0,0 +1,97 @@
+# Worker cold-start time.
+#
+#   python bench/startup.py --runs 10 > startup.json
+#   python bench/startup.py --baseline startup.json --max-ms 400
+#
+# Starts a fresh interpreter per run, as a new worker would, that imports
+# app and calls create_app() under `python -X importtime`. Prints the median
+# import and create_app() times and the modules with the largest cumulative
+# import time as JSON; with --baseline it also reports the change against an
+# earlier run, and --max-ms fails the run when startup takes longer.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CHILD = '''
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print((imported - started) * 1000, (created - imported) * 1000)
+'''
+
+def parse_importtime(stderr):
+    # {module: cumulative microseconds} for the modules app imports itself,
+    # one level below it in the import tree (indented by two more spaces)
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if len(name) - len(name.lstrip(' ')) == 3:
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+def run_once(python):
+    process = subprocess.run(
+        [python, '-X', 'importtime', '-c', CHILD],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+    )
+    import_ms, create_ms = (float(part) for part in process.stdout.split()[-2:])
+    return import_ms, create_ms, parse_importtime(process.stderr)
+
+def compare(report, baseline):
+    change = {}
+    for key in ('import_ms', 'create_app_ms', 'startup_ms'):
+        if baseline.get(key):
+            change[key] = round((report[key] - baseline[key]) / baseline[key] * 100, 1)
+    return change
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the cold-start time of a worker.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15, help='slowest top-level imports to list')
+    parser.add_argument('--python', default=sys.executable, help='interpreter to start workers with')
+    parser.add_argument('--baseline', type=argparse.FileType('r'), help='earlier JSON report to compare with')
+    parser.add_argument('--max-ms', type=float, help='exit non-zero if the median startup takes longer')
+    args = parser.parse_args()
+
+    # one untimed run, so every run after it finds the bytecode of the
+    # installed packages on disk
+    run_once(args.python)
+    imports, creates, modules = [], [], defaultdict(list)
+    for _ in range(args.runs):
+        import_ms, create_ms, cumulative = run_once(args.python)
+        imports.append(import_ms)
+        creates.append(create_ms)
+        for name, us in cumulative.items():
+            modules[name].append(us)
+
+    slowest = sorted(((statistics.median(times), name) for name, times in modules.items()), reverse=True)
+    report = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'import_ms': round(statistics.median(imports), 1),
+        'create_app_ms': round(statistics.median(creates), 1),
+        'startup_ms': round(statistics.median(i + c for i, c in zip(imports, creates)), 1),
+        'imports_ms': {name: round(us / 1000, 1) for us, name in slowest[:args.top]},
+    }
+    if args.baseline:
+        report['change_pct'] = compare(report, json.load(args.baseline))
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    if args.max_ms is not None and report['startup_ms'] > args.max_ms:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
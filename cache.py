@@ -0,0 +1,307 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, g, Response
+from sqlalchemy import event, inspect
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Rendered response cache.
+#
+# GET pages are cached per path + query string. Every entry records the
+# version of each tag it depends on ('Venue', 'Venue:3', 'Artist:*', ...);
+# committing a change to a Venue, Artist or Show bumps the versions of the
+# affected tags, so stale entries simply stop matching: a row written through
+# the session bumps its listing tag and its own 'Venue:3', while 'Venue:*' is
+# only bumped by bulk and Core writes that cannot name the rows they touched
+# (see bulk_tags). Versions are kept in
+# the same backend as the entries so that a shared backend invalidates every
+# worker at once.
+#----------------------------------------------------------------------------#
+
+#  Backends
+#  ----------------------------------------------------------------
+
+class LocalBackend:
+    # in-process LRU with per-entry expiry. Tag versions live in their own
+    # table so that evicting them can never resurrect a stale entry.
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + timeout if timeout else None
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_versions(self, tags):
+        with self.lock:
+            return [self.versions.get(tag, 0) for tag in tags]
+
+    def bump_versions(self, tags):
+        with self.lock:
+            for tag in tags:
+                self.versions[tag] = self.versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+class SharedBackend:
+    # any client speaking the get/set/mget/incr subset of redis-py
+    def __init__(self, client, prefix='fyyur:cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def get_versions(self, tags):
+        if not tags:
+            return []
+        raw = self.client.mget([self.prefix + 'tag:' + tag for tag in tags])
+        return [int(version) if version is not None else 0 for version in raw]
+
+    def bump_versions(self, tags):
+        for tag in tags:
+            self.client.incr(self.prefix + 'tag:' + tag)
+
+    def clear(self):
+        pass
+
+
+class LocalRedis:
+    # stand-in for a redis client in tests and single-host development; values
+    # round-trip through bytes exactly as they would over the wire
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires < time.monotonic():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self.lock:
+            self.data[key] = (time.monotonic() + ex if ex else None, bytes(value))
+        return True
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def incr(self, key):
+        with self.lock:
+            expires, value = self.data.get(key, (None, b'0'))
+            value = str(int(value) + 1).encode()
+            self.data[key] = (expires, value)
+            return int(value)
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def get_versions(self, tags):
+        return [0] * len(tags)
+
+    def bump_versions(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+#  Cache
+#  ----------------------------------------------------------------
+
+def entity_tags(model, id):
+    # what a page showing this row depends on: the row and any bulk write
+    name = model.__name__
+    return [f'{name}:{id}', f'{name}:*']
+
+def bulk_tags(*models):
+    # what a write that cannot name its rows invalidates
+    tags = set()
+    for model in models:
+        tags.update((model.__name__, f'{model.__name__}:*'))
+    return sorted(tags)
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.timeout = None
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0}
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'local')
+        if cache_type == 'local':
+            self.backend = LocalBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        elif cache_type == 'redis':
+            self.backend = SharedBackend.from_url(app.config['CACHE_REDIS_URL'])
+        elif cache_type == 'shared-local':
+            self.backend = SharedBackend(LocalRedis())
+        elif cache_type == 'null':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'unknown CACHE_TYPE {cache_type!r}')
+        self.timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 60)
+        app.extensions['response_cache'] = self
+
+    def _count(self, stat, n=1):
+        with self.lock:
+            self.stats[stat] += n
+
+    def add_tags(self, *tags):
+        # called from inside a cached view for dependencies only known once the
+        # data has been loaded, e.g. the artists listed on a venue page
+        if 'cache_tags' in g:
+            g.cache_tags.update(tags)
+
+    def invalidate(self, tags):
+        tags = sorted(set(tags))
+        if tags:
+            self.backend.bump_versions(tags)
+            self._count('invalidations', len(tags))
+
+    def cached(self, *tags, timeout=None):
+        # tags may reference the view arguments, e.g. 'Venue:{venue_id}'
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # pages carrying a flashed message are personal; never serve or
+                # store them from the cache
+                if request.method != 'GET' or '_flashes' in session:
+                    return view(**kwargs)
+                key = 'view:' + request.full_path
+                # under conditional.versioned the entry is kept per page
+                # version: a show starting changes the page but writes no row
+                version = g.pop('page_version', None)
+                if version is not None:
+                    key += '#' + version
+                entry = self.backend.get(key)
+                if entry is not None:
+                    names = list(entry['tags'])
+                    if self.backend.get_versions(names) == [entry['tags'][name] for name in names]:
+                        self._count('hits')
+                        return Response(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+                self._count('misses')
+
+                static_tags = [tag.format(**kwargs) for tag in tags]
+                versions = dict(zip(static_tags, self.backend.get_versions(static_tags)))
+                g.cache_tags = set()
+                response = view(**kwargs)
+                dynamic_tags = sorted(g.pop('cache_tags') - set(versions))
+                versions.update(zip(dynamic_tags, self.backend.get_versions(dynamic_tags)))
+
+                if not isinstance(response, Response):
+                    response = Response(response)
+                if response.status_code == 200 and not response.direct_passthrough:
+                    self.backend.set(key, {
+                        'body': response.get_data(),
+                        'status': response.status_code,
+                        'mimetype': response.mimetype,
+                        'tags': versions,
+                    }, timeout or self.timeout)
+                    self._count('stores')
+                return response
+            return wrapper
+        return decorator
+
+
+cache = ResponseCache()
+
+#  Invalidation
+#  ----------------------------------------------------------------
+#  Tags touched by a flush are collected on the session and only invalidated
+#  once the transaction commits.
+
+def _model_tags(obj):
+    if isinstance(obj, Show):
+        tags = ['Show']
+        state = inspect(obj)
+        for attr, model in (('venue_id', Venue), ('artist_id', Artist)):
+            history = state.attrs[attr].history
+            for id in set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ()):
+                if id is not None:
+                    tags.append(f'{model.__name__}:{id}')
+        return tags
+    if isinstance(obj, (Venue, Artist)):
+        # only this row's pages; other detail pages stay cached
+        name = type(obj).__name__
+        return [name, f'{name}:{obj.id}']
+    return []
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_before_flush(session, flush_context, instances):
+    # attribute history is only available before the flush resets it
+    pending = session.info.setdefault('cache_tags', set())
+    for obj in session.dirty | session.deleted:
+        pending.update(_model_tags(obj))
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_after_flush(session, flush_context):
+    pending = session.info.setdefault('cache_tags', set())
+    for obj in session.new:
+        pending.update(_model_tags(obj))
+
+def _collect_bulk(context):
+    model = context.mapper.class_
+    if model in (Venue, Artist, Show):
+        tags = bulk_tags(Venue, Artist, Show) if model is Show else bulk_tags(model)
+        context.session.info.setdefault('cache_tags', set()).update(tags)
+
+event.listen(db.session, 'after_bulk_update', _collect_bulk)
+event.listen(db.session, 'after_bulk_delete', _collect_bulk)
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        cache.invalidate(tags)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop('cache_tags', None)
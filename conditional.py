@@ -0,0 +1,64 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import Response, request, session, g, abort
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#
+# ``conditional`` tags a response with a digest of its body, which saves the
+# client the transfer. ``versioned`` goes further for pages whose version can
+# be read cheaply up front: it answers If-None-Match / If-Modified-Since with
+# a 304 before the view, its queries or its template run at all.
+#----------------------------------------------------------------------------#
+
+def conditional(view):
+    # the tag is a digest of the body, so it holds across workers and cache hits
+    @wraps(view)
+    def wrapper(**kwargs):
+        response = view(**kwargs)
+        if response.status_code == 200:
+            response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+            response.make_conditional(request)
+        return response
+    return wrapper
+
+def _validators(version):
+    # the newest timestamp in the version is the Last-Modified date; the
+    # whole row, counts included, goes into the ETag
+    stamps = [value for value in version if isinstance(value, datetime)]
+    last_modified = min(max(stamps), datetime.utcnow()).replace(microsecond=0)
+    etag = hashlib.sha1(repr(tuple(version)).encode()).hexdigest()
+    return etag, last_modified
+
+def versioned(version):
+    # version(**view_args) returns a row describing what the page shows, or
+    # None when the entity does not exist
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # a page carrying a flashed message must be rendered to show it
+            if '_flashes' in session:
+                return view(**kwargs)
+            current = version(**kwargs)
+            if current is None:
+                abort(404)
+            etag, last_modified = _validators(current)
+            response = Response()
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            if response.make_conditional(request).status_code == 304:
+                return response
+            # a cached body is only served under the tag it was rendered for
+            g.page_version = etag
+            rendered = view(**kwargs)
+            if not isinstance(rendered, Response):
+                rendered = Response(rendered)
+            if rendered.status_code == 200:
+                rendered.set_etag(etag, weak=True)
+                rendered.last_modified = last_modified
+                rendered.cache_control.no_cache = True
+            return rendered
+        return wrapper
+    return decorator
@@ -9,5 +9,90 @@ DEBUG = True
 # Connect to the database
 
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = '<Put your local database url>'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://localhost:5432/fyyur')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, picked per deployment with FYYUR_ENV ('development',
+# 'testing' or 'production'); any single value can be overridden with the
+# matching DATABASE_POOL_* variable. Keep workers * (size + overflow) below
+# PostgreSQL's max_connections. Recycle and pre-ping retire connections the
+# server or a firewall closed while the worker sat idle.
+FYYUR_ENV = os.environ.get('FYYUR_ENV', 'development')
+DATABASE_POOL_PROFILES = {
+    'development': {'size': 2, 'max_overflow': 2, 'recycle': 1800, 'pre_ping': True, 'timeout': 10},
+    'testing': {'size': 1, 'max_overflow': 0, 'recycle': -1, 'pre_ping': False, 'timeout': 5},
+    'production': {'size': 5, 'max_overflow': 5, 'recycle': 300, 'pre_ping': True, 'timeout': 5},
+}
+_pool = DATABASE_POOL_PROFILES[FYYUR_ENV]
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', _pool['size']))
+DATABASE_POOL_MAX_OVERFLOW = int(os.environ.get('DATABASE_POOL_MAX_OVERFLOW', _pool['max_overflow']))
+DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', _pool['recycle']))
+DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', str(_pool['pre_ping'])).lower() in ('1', 'true', 'yes')
+DATABASE_POOL_TIMEOUT = float(os.environ.get('DATABASE_POOL_TIMEOUT', _pool['timeout']))
+# Read replicas for GET requests, comma separated; empty reads from the primary.
+SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+# Set when connecting through PgBouncer in transaction mode: PgBouncer does
+# the pooling, so each checkout opens a fresh client connection (NullPool)
+# and nothing may outlive a transaction, such as prepared statements.
+DATABASE_PGBOUNCER = os.environ.get('DATABASE_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+
+# Maximum number of rows returned by the venue/artist search pages.
+SEARCH_RESULT_LIMIT = int(os.environ.get('SEARCH_RESULT_LIMIT', 20))
+
+# Rows per page on the /venues, /artists and /shows listings.
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))
+
+# Rendered page cache for the read-heavy GET routes: 'local' (per-process
+# LRU), 'redis' (shared between workers, needs CACHE_REDIS_URL),
+# 'shared-local' (the shared code path against an in-memory stand-in) or
+# 'null' to disable caching.
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'local')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 60))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+
+# Largest radius, in miles, accepted by /venues/nearby.
+NEARBY_MAX_RADIUS = float(os.environ.get('NEARBY_MAX_RADIUS', 500))
+
+# Venues and artists whose bookings are kept in memory for the conflict check
+# on databases without range indexes (SQLite). The copies only follow this
+# process's writes, so keep them to a single development process; 0 checks
+# every booking against the database instead, for more than one worker.
+# FREE_SLOTS_MAX_DAYS is the longest stretch the free-slot API will search
+# in one request.
+SCHEDULE_INDEX_MAX_OWNERS = int(os.environ.get('SCHEDULE_INDEX_MAX_OWNERS', 1024))
+FREE_SLOTS_MAX_DAYS = int(os.environ.get('FREE_SLOTS_MAX_DAYS', 31))
+# Most shows accepted by one /shows/create-batch submission; they are written
+# with a single INSERT, so this also bounds its bind parameters.
+SHOW_BATCH_MAX_ROWS = int(os.environ.get('SHOW_BATCH_MAX_ROWS', 500))
+# A deleted venue's shows are removed this many per transaction, with a pause
+# (in seconds) between batches so other writers get the shows table.
+VENUE_PURGE_BATCH_SIZE = int(os.environ.get('VENUE_PURGE_BATCH_SIZE', 1000))
+VENUE_PURGE_PAUSE = float(os.environ.get('VENUE_PURGE_PAUSE', 0.05))
+
+# /img proxy for venue and artist images: scaled copies are kept under
+# IMAGE_CACHE_DIR (unset uses a directory under the system temp dir) up to
+# IMAGE_CACHE_MAX_BYTES. Sources on private addresses are refused unless
+# IMAGE_PROXY_ALLOW_PRIVATE, for a local stand-in in development.
+IMAGE_PROXY_ENABLED = os.environ.get('IMAGE_PROXY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR') or None
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+IMAGE_FETCH_TIMEOUT = float(os.environ.get('IMAGE_FETCH_TIMEOUT', 5))
+IMAGE_FETCH_MAX_BYTES = int(os.environ.get('IMAGE_FETCH_MAX_BYTES', 10 * 1024 * 1024))
+IMAGE_PROXY_ALLOW_PRIVATE = os.environ.get('IMAGE_PROXY_ALLOW_PRIVATE', '').lower() in ('1', 'true', 'yes')
+
+# Compiled template bytecode, shared by the workers; unset uses a private
+# directory under the system temp dir. TEMPLATE_PRECOMPILE loads every
+# template at startup (run `flask compile-templates` at deploy time to warm
+# the directory before the workers start).
+TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get('TEMPLATE_BYTECODE_CACHE_DIR') or None
+TEMPLATE_PRECOMPILE = os.environ.get('TEMPLATE_PRECOMPILE', 'true').lower() in ('1', 'true', 'yes')
+# Per-process LRU for {% cache %} blocks; 0 disables it. Keys carry entity
+# versions, so the timeout only bounds memory held by dead versions.
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 4096))
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 3600))
+
+# Per-request SQL/render timing, Server-Timing headers and /_metrics.
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '').lower() in ('1', 'true', 'yes')
+# Flag a statement as a likely N+1 once it runs more often than this in one request.
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = int(os.environ.get('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 10))
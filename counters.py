@@ -0,0 +1,176 @@
+from collections import Counter, defaultdict
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect
+from models import db, utcnow, Venue, Artist, Show
+from cache import cache
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#
+# The listings and search results print Venue.upcoming_shows_count and
+# Artist.upcoming_shows_count straight off the row instead of counting
+# shows. A show written with its start still ahead is flagged upcoming, and
+# flagged shows count towards their venue and artist. Counters move in the
+# transaction that writes the show, as "n = n + k" UPDATEs so concurrent
+# writers never lose an increment, and
+#
+#   flask roll-shows
+#
+# run every few minutes (cron, a systemd timer) clears the flag on shows
+# that have started and takes them off the counters; until it runs, a show
+# that just started still counts. Writes that bypass the session must call
+# count_new_shows / count_deleted_shows themselves; `flask roll-shows
+# --recount` rebuilds everything from the start times.
+#----------------------------------------------------------------------------#
+
+_owners = {Venue: 'venue_id', Artist: 'artist_id'}
+
+def database_now():
+    # the clock the detail pages compare start_time with, naive like the columns
+    return db.session.execute(db.select(utcnow())).scalar()
+
+def adjust(session, deltas):
+    # deltas: {(model, id): change}, applied with one UPDATE per model and
+    # distinct change. The counters are not part of a row's version, so
+    # updated_at is left alone
+    ids = defaultdict(list)
+    for (model, id), change in deltas.items():
+        if change and id is not None:
+            ids[model, change].append(id)
+    for (model, change), owner_ids in ids.items():
+        table = model.__table__
+        session.execute(
+            table.update()
+                .where(table.c.id.in_(owner_ids))
+                .values(upcoming_shows_count=table.c.upcoming_shows_count + change, updated_at=table.c.updated_at)
+        )
+
+def _deltas(shows, sign):
+    deltas = Counter()
+    for show in shows:
+        if show['upcoming']:
+            for model, column in _owners.items():
+                deltas[model, show[column]] += sign
+    return deltas
+
+def count_new_shows(shows, now=None):
+    """Flag and count show rows (dicts) written with a Core INSERT; call it
+    in the same transaction."""
+    now = now or database_now()
+    for show in shows:
+        show['upcoming'] = show['start_time'] > now
+    adjust(db.session, _deltas(shows, +1))
+
+def count_deleted_shows(shows):
+    """Take show rows (with venue_id, artist_id and upcoming) deleted with a
+    Core DELETE off the counters; call it in the same transaction."""
+    adjust(db.session, _deltas(shows, -1))
+
+#  Session writes
+#  ----------------------------------------------------------------
+#  New shows (and shows whose start moved) are flagged before the flush; the
+#  counters follow in after_flush, once the foreign keys are filled in and
+#  while the attribute history still holds the values the rows had before.
+
+@event.listens_for(db.session, 'before_flush')
+def _flag(session, flush_context, instances):
+    now = None
+    moved = [obj for obj in session.dirty if isinstance(obj, Show) and inspect(obj).attrs.start_time.history.has_changes()]
+    for obj in [obj for obj in session.new if isinstance(obj, Show)] + moved:
+        if now is None:
+            now = database_now()
+        obj.upcoming = obj.start_time > now
+
+def _before(state, attr):
+    history = state.attrs[attr].history
+    values = history.deleted or history.unchanged
+    return values[0] if values else None
+
+@event.listens_for(db.session, 'after_flush')
+def _count(session, flush_context):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Show) and obj.upcoming:
+            for model, column in _owners.items():
+                deltas[model, getattr(obj, column)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Show) and obj.upcoming:
+            for model, column in _owners.items():
+                deltas[model, getattr(obj, column)] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Show) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        for model, column in _owners.items():
+            if _before(state, 'upcoming'):
+                deltas[model, _before(state, column)] -= 1
+            if obj.upcoming:
+                deltas[model, getattr(obj, column)] += 1
+    adjust(session, deltas)
+
+#  Rolling
+#  ----------------------------------------------------------------
+
+def roll(now=None, batch_size=1000):
+    """Unflag shows that have started and take them off the counters, a
+    batch per transaction. Returns the number of shows rolled."""
+    now = now or database_now()
+    show = Show.__table__
+    rolled = 0
+    tags = {'Show'}
+    while True:
+        rows = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.upcoming) \
+            .filter(Show.upcoming, Show.start_time <= now) \
+            .order_by(Show.start_time) \
+            .limit(batch_size) \
+            .all()
+        if not rows:
+            break
+        db.session.execute(
+            show.update()
+                .where(show.c.id.in_([row.id for row in rows]))
+                .values(upcoming=False, updated_at=show.c.updated_at)
+        )
+        count_deleted_shows([row._asdict() for row in rows])
+        db.session.commit()
+        rolled += len(rows)
+        tags.update('Venue:{}'.format(row.venue_id) for row in rows)
+        tags.update('Artist:{}'.format(row.artist_id) for row in rows)
+    if rolled:
+        # the listings and search results print the counters, the owners'
+        # pages split their shows into upcoming and past
+        cache.invalidate(sorted(tags))
+    return rolled
+
+def recount(now=None):
+    """Rebuild every flag and counter from the start times."""
+    now = now or database_now()
+    show = Show.__table__
+    upcoming = show.c.start_time > now
+    db.session.execute(
+        show.update()
+            .where(show.c.upcoming != upcoming)
+            .values(upcoming=upcoming, updated_at=show.c.updated_at)
+    )
+    for model, column in _owners.items():
+        table = model.__table__
+        count = db.select(db.func.count()) \
+            .where(show.c[column] == table.c.id, show.c.upcoming) \
+            .scalar_subquery()
+        db.session.execute(table.update().values(upcoming_shows_count=count, updated_at=table.c.updated_at))
+    db.session.commit()
+    cache.invalidate(['Show'])
+
+
+@click.command('roll-shows')
+@click.option('--recount', 'full', is_flag=True, help='Rebuild every flag and counter from the start times.')
+@click.option('--batch-size', default=1000, show_default=True, help='Shows per transaction.')
+@with_appcontext
+def roll_shows(full, batch_size):
+    """Move shows that have started off the upcoming counters."""
+    if full:
+        recount()
+        click.echo('Recounted upcoming shows.')
+    else:
+        click.echo('Rolled {} shows from upcoming to past.'.format(roll(batch_size=batch_size)))
@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+from datetime import datetime
+from models import db, Venue, Artist, Show
+from queries import live
+
+#----------------------------------------------------------------------------#
+# Show calendar export.
+#
+# Rows come off a server-side cursor a chunk at a time and each format is a
+# generator over them, so the response starts before the query finishes and
+# memory stays flat however long the show history gets.
+#----------------------------------------------------------------------------#
+
+YIELD_PER = 1000
+
+COLUMNS = ('id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link')
+
+def show_rows():
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.end_time,
+        Venue.id.label('venue_id'),
+        Venue.name.label('venue_name'),
+        Artist.id.label('artist_id'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+    ).join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id) \
+        .filter(live(Venue)) \
+        .order_by(Show.start_time, Show.id) \
+        .yield_per(YIELD_PER)
+
+def _chunks(lines):
+    # send the header straight away, then hand the WSGI server reasonably
+    # sized writes instead of one per row
+    lines = iter(lines)
+    yield next(lines, '')
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= 64 * 1024:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+#  CSV
+#  ----------------------------------------------------------------
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for row in rows:
+        writer.writerow([row.start_time.isoformat() if column == 'start_time' else getattr(row, column)
+                         for column in COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+#  NDJSON
+#  ----------------------------------------------------------------
+
+def _ndjson_lines(rows):
+    for row in rows:
+        record = {column: getattr(row, column) for column in COLUMNS}
+        record['start_time'] = row.start_time.isoformat()
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+#  iCalendar
+#  ----------------------------------------------------------------
+
+def _ics_escape(text):
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def _ics_fold(line):
+    # content lines are limited to 75 octets; continuations start with a space
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+def _ics_lines(rows, host):
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Fyyur//Show calendar//EN\r\n'
+    for row in rows:
+        yield ''.join([
+            'BEGIN:VEVENT\r\n',
+            _ics_fold(f'UID:show-{row.id}@{host}'),
+            f'DTSTAMP:{stamp}\r\n',
+            # the columns hold naive UTC
+            f'DTSTART:{row.start_time.strftime("%Y%m%dT%H%M%SZ")}\r\n',
+            f'DTEND:{row.end_time.strftime("%Y%m%dT%H%M%SZ")}\r\n',
+            _ics_fold('SUMMARY:' + _ics_escape(f'{row.artist_name} at {row.venue_name}')),
+            _ics_fold('LOCATION:' + _ics_escape(row.venue_name)),
+            'END:VEVENT\r\n',
+        ])
+    yield 'END:VCALENDAR\r\n'
+
+#  Formats
+#  ----------------------------------------------------------------
+
+FORMATS = {
+    'csv': ('text/csv', 'shows.csv'),
+    'ndjson': ('application/x-ndjson', 'shows.ndjson'),
+    'ics': ('text/calendar', 'shows.ics'),
+}
+
+def export_shows(format, host='fyyur'):
+    rows = show_rows()
+    if format == 'csv':
+        lines = _csv_lines(rows)
+    elif format == 'ndjson':
+        lines = _ndjson_lines(rows)
+    elif format == 'ics':
+        lines = _ics_lines(rows, host)
+    else:
+        raise ValueError(f'unknown export format {format!r}')
+    return _chunks(lines)
@@ -5,9 +5,14 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # smoke test: every route in the bench mix against a throwaway catalog
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "rm -f /tmp/fyyur-smoke.db && "
+            "export DATABASE_URL=sqlite:////tmp/fyyur-smoke.db && "
+            "python bench/seed.py --scale 0.001 && "
+            "python bench/load.py --requests 300 --fail-on-errors > /dev/null",
+            capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
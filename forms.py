@@ -1,21 +1,95 @@
-from datetime import datetime
+import csv
+import io
+from datetime import datetime, timedelta
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from werkzeug.datastructures import MultiDict
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField, TextAreaField
+from wtforms.validators import DataRequired, InputRequired, AnyOf, URL, Regexp, Optional, NumberRange
+from models import Genre
+
+GENRES = [
+    'Alternative',
+    'Blues',
+    'Classical',
+    'Country',
+    'Electronic',
+    'Folk',
+    'Funk',
+    'Hip-Hop',
+    'Heavy Metal',
+    'Instrumental',
+    'Jazz',
+    'Musical Theatre',
+    'Pop',
+    'Punk',
+    'R&B',
+    'Reggae',
+    'Rock n Roll',
+    'Soul',
+    'Other',
+]
 
 class ShowForm(Form):
     artist_id = StringField(
-        'artist_id'
+        'artist_id', validators=[DataRequired(), Regexp(r'^\d+$')]
     )
     venue_id = StringField(
-        'venue_id'
+        'venue_id', validators=[DataRequired(), Regexp(r'^\d+$')]
     )
+    # InputRequired rather than DataRequired: the default only pre-fills the
+    # empty form, and must never stand in for a start time left out
     start_time = DateTimeField(
         'start_time',
-        validators=[DataRequired()],
-        default= datetime.today()
+        validators=[InputRequired()],
+        default=datetime.today
+    )
+    # minutes
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=15, max=24 * 60)],
+        default=120
     )
 
+    def column_values(self):
+        return {
+            'artist_id': int(self.artist_id.data),
+            'venue_id': int(self.venue_id.data),
+            'start_time': self.start_time.data,
+            'end_time': self.start_time.data + timedelta(minutes=self.duration.data or 120),
+        }
+
+class ShowBatchForm(Form):
+    # one show per line: artist_id, venue_id, start_time[, duration]
+    COLUMNS = ('artist_id', 'venue_id', 'start_time', 'duration')
+
+    rows = TextAreaField(
+        'rows', validators=[DataRequired()]
+    )
+
+    def _lines(self):
+        # (line number, stripped fields) for every non-blank line
+        for line, fields in enumerate(csv.reader(io.StringIO(self.rows.data)), start=1):
+            fields = [field.strip() for field in fields]
+            if any(fields):
+                yield line, fields
+
+    def count(self):
+        # the number of shows, without validating any of them
+        return sum(1 for line in self._lines())
+
+    def shows(self):
+        # (line number, column values, errors) for every non-blank line;
+        # the values are None when the line does not validate
+        for line, fields in self._lines():
+            if len(fields) > len(self.COLUMNS):
+                yield line, None, ['expected at most {} columns'.format(len(self.COLUMNS))]
+                continue
+            form = ShowForm(formdata=MultiDict(zip(self.COLUMNS, fields)), meta={'csrf': False})
+            if form.validate():
+                yield line, form.column_values(), []
+            else:
+                yield line, None, ['{}: {}'.format(name, ' '.join(messages)) for name, messages in form.errors.items()]
+
 class VenueForm(Form):
     name = StringField(
         'name', validators=[DataRequired()]
@@ -91,27 +165,7 @@ class VenueForm(Form):
     genres = SelectMultipleField(
         # TODO implement enum restriction
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        choices=[(genre, genre) for genre in GENRES]
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -126,6 +180,20 @@ class VenueForm(Form):
         'seeking_description'
     )
 
+    def column_values(self):
+        return {
+            'name': self.name.data,
+            'city': self.city.data,
+            'state': self.state.data,
+            'address': self.address.data,
+            'phone': self.phone.data,
+            'image_link': self.image_link.data,
+            'genres': list(self.genres.data),
+            'facebook_link': self.facebook_link.data,
+            'website_link': self.website_link.data,
+            'seeking_talent': self.seeking_talent.data,
+            'seeking_description': self.seeking_description.data,
+        }
 
 
 class ArtistForm(Form):
@@ -200,27 +268,7 @@ class ArtistForm(Form):
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        choices=[(genre, genre) for genre in GENRES]
      )
     facebook_link = StringField(
         # TODO implement enum restriction
@@ -237,3 +285,22 @@ class ArtistForm(Form):
             'seeking_description'
      )
 
+    def column_values(self):
+        return {
+            'name': self.name.data,
+            'city': self.city.data,
+            'state': self.state.data,
+            'phone': self.phone.data,
+            'image_link': self.image_link.data,
+            'genres': list(self.genres.data),
+            'facebook_link': self.facebook_link.data,
+            'website_link': self.website_link.data,
+            'seeking_venue': self.seeking_venue.data,
+            'seeking_description': self.seeking_description.data,
+        }
+
+def model_values(form):
+    # form data as model attributes, with genre names resolved to Genre rows
+    values = form.column_values()
+    values['genres'] = Genre.by_names(values['genres'])
+    return values
@@ -0,0 +1,204 @@
+import re
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect
+from models import db, Genre, Venue, Artist, venue_genres, artist_genres
+from queries import live
+
+#----------------------------------------------------------------------------#
+# Full-text search.
+#
+# /search matches words against a venue's or artist's name, genres, place
+# and seeking description at once, best matches first. On PostgreSQL every
+# row carries a weighted tsvector (name A, genres B, place C, description
+# D) under a GIN index, matched with websearch_to_tsquery and ordered by
+# ts_rank, venues and artists in one UNION ALL. Other databases (SQLite in
+# development) keep an FTS5 table ranked by bm25 with the same emphasis.
+#
+# Documents are rebuilt in SQL from the rows and their genre links: after
+# any flush that wrote a venue or artist, and for Core bulk writes by
+# calling refresh(), or `flask rebuild-search` for everything.
+#----------------------------------------------------------------------------#
+
+TEXT_SEARCH_CONFIG = 'english'
+BATCH_SIZE = 500
+
+KINDS = {Venue: 'venue', Artist: 'artist'}
+
+_genre_links = {
+    Venue: (venue_genres, venue_genres.c.venue_id),
+    Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+# bm25 weights in the column order of the FTS5 table (models.SEARCH_INDEX_DDL)
+_fts_weights = (0.0, 0.0, 10.0, 4.0, 2.0, 1.0)
+
+_fts = db.table('search_index',
+    db.column('kind'), db.column('owner_id'), db.column('name'), db.column('genres'), db.column('place'),
+    db.column('seeking'))
+
+def _postgresql():
+    return db.engine.dialect.name == 'postgresql'
+
+def _fields(model):
+    # name, genres, place and seeking description as SQL over the model's table
+    table = model.__table__
+    links, owner_id = _genre_links[model]
+    names = db.func.string_agg(Genre.name, ' ') if _postgresql() else db.func.group_concat(Genre.name, ' ')
+    genres = db.select(names) \
+        .select_from(links.join(Genre, Genre.id == links.c.genre_id)) \
+        .where(owner_id == table.c.id) \
+        .scalar_subquery()
+    place = table.c.city + ' ' + table.c.state
+    if model is Venue:
+        place = db.func.coalesce(table.c.address, '') + ' ' + place
+    return table.c.name, genres, place, table.c.seeking_description
+
+def _vector(model):
+    def part(text, weight):
+        return db.func.setweight(db.func.to_tsvector(TEXT_SEARCH_CONFIG, db.func.coalesce(text, '')), weight)
+    name, genres, place, seeking = _fields(model)
+    return part(name, 'A').op('||')(part(genres, 'B')).op('||')(part(place, 'C')).op('||')(part(seeking, 'D'))
+
+#  Maintenance
+#  ----------------------------------------------------------------
+
+def refresh(model, ids=None, session=None):
+    """Rebuild the search documents of ``ids`` (every row when None) from
+    the database, in the current transaction."""
+    session = session or db.session
+    table = model.__table__
+    if ids is None:
+        batches = [None]
+    else:
+        ids = sorted(ids)
+        batches = [ids[start:start + BATCH_SIZE] for start in range(0, len(ids), BATCH_SIZE)]
+    for batch in batches:
+        if _postgresql():
+            # the document is not part of the row's version
+            update = table.update().values(search_vector=_vector(model), updated_at=table.c.updated_at)
+            session.execute(update if batch is None else update.where(table.c.id.in_(batch)))
+            continue
+        delete = _fts.delete().where(_fts.c.kind == KINDS[model])
+        rows = db.select(db.literal(KINDS[model]), table.c.id, *_fields(model)).where(live(model))
+        if batch is not None:
+            delete = delete.where(_fts.c.owner_id.in_(batch))
+            rows = rows.where(table.c.id.in_(batch))
+        session.execute(delete)
+        session.execute(_fts.insert().from_select(list(_fts.c), rows))
+
+def _forget(model, ids, session):
+    # PostgreSQL keeps the document on the row, which is gone already
+    if ids and not _postgresql():
+        session.execute(_fts.delete().where(_fts.c.kind == KINDS[model], _fts.c.owner_id.in_(sorted(ids))))
+
+# what the documents are made of; a genre change shows up as a change to
+# the owner's genres collection. A deleted venue has no document
+_indexed = ('name', 'genres', 'city', 'state', 'address', 'seeking_description', 'deleted_at')
+
+def _written(obj):
+    attrs = inspect(obj).attrs
+    return any(attrs[attr].history.has_changes() for attr in _indexed if attr in attrs)
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh(session, flush_context):
+    for model in KINDS:
+        written = {obj.id for obj in session.new if type(obj) is model}
+        written |= {obj.id for obj in session.dirty if type(obj) is model and _written(obj)}
+        if written:
+            refresh(model, written, session)
+        _forget(model, {obj.id for obj in session.deleted if type(obj) is model}, session)
+
+#  Queries
+#  ----------------------------------------------------------------
+
+def _fts_query(term):
+    # every word must match; quoting keeps FTS5 syntax out of user input
+    words = re.findall(r'\w+', term.lower())
+    return ' '.join('"{}"'.format(word) for word in words)
+
+def _result(kind, row):
+    return {
+        "type": kind,
+        "id": row.id,
+        "name": row.name,
+        "city": row.city,
+        "state": row.state,
+        "num_upcoming_shows": row.upcoming_shows_count,
+    }
+
+def _search_postgresql(term, limit):
+    query = db.func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, term)
+    branches = [
+        db.select(
+            db.literal(kind).label('kind'),
+            model.id,
+            model.name,
+            model.city,
+            model.state,
+            model.upcoming_shows_count,
+            db.func.ts_rank(model.search_vector, query).label('rank'),
+        ).where(model.search_vector.op('@@')(query), live(model))
+        for model, kind in KINDS.items()
+    ]
+    matches = db.union_all(*branches).subquery()
+    rows = db.session.query(matches, db.func.count().over().label('total')) \
+        .order_by(matches.c.rank.desc(), matches.c.name, matches.c.id) \
+        .limit(limit) \
+        .all()
+    return (rows[0].total if rows else 0), [_result(row.kind, row) for row in rows]
+
+def _search_fts(term, limit):
+    query = _fts_query(term)
+    if not query:
+        return 0, []
+    score = db.func.bm25(db.literal_column('search_index'), *_fts_weights)
+    matches = db.select(_fts.c.kind, _fts.c.owner_id, score.label('score')) \
+        .where(db.literal_column('search_index').op('MATCH')(query)) \
+        .subquery()
+    hits = db.session.execute(
+        db.select(matches.c.kind, matches.c.owner_id, db.func.count().over().label('total'))
+            .order_by(matches.c.score, matches.c.owner_id)
+            .limit(limit)
+    ).all()
+    if not hits:
+        return 0, []
+    rows = {}
+    for model, kind in KINDS.items():
+        ids = [hit.owner_id for hit in hits if hit.kind == kind]
+        if ids:
+            found = db.session.query(model.id, model.name, model.city, model.state, model.upcoming_shows_count) \
+                .filter(model.id.in_(ids))
+            rows.update(((kind, row.id), row) for row in found)
+    return hits[0].total, [_result(hit.kind, rows[hit.kind, hit.owner_id])
+                           for hit in hits if (hit.kind, hit.owner_id) in rows]
+
+def search_all(term, limit=None):
+    """Venues and artists matching every word of ``term`` in their name,
+    genres, place or seeking description, best first."""
+    term = term.strip()
+    if limit is None:
+        limit = current_app.config.get('SEARCH_RESULT_LIMIT', 20)
+    if not term:
+        count, data = 0, []
+    elif _postgresql():
+        count, data = _search_postgresql(term, limit)
+    else:
+        count, data = _search_fts(term, limit)
+    return {"count": count, "data": data}
+
+
+def rebuild():
+    """Rebuild the search document of every venue and artist."""
+    for model in KINDS:
+        refresh(model)
+    db.session.commit()
+
+
+@click.command('rebuild-search')
+@with_appcontext
+def rebuild_search():
+    """Rebuild the full-text search documents of every venue and artist."""
+    rebuild()
+    click.echo('Rebuilt the search documents.')
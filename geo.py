@@ -0,0 +1,215 @@
+import csv
+import math
+from collections import Counter
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect
+from models import db, Venue
+from queries import live
+from cache import cache, bulk_tags
+
+#----------------------------------------------------------------------------#
+# Venue locations.
+#
+#   flask geocode-venues cities1000.txt
+#
+# fills in Venue.latitude / longitude, at city granularity, from a local
+# gazetteer: a GeoNames dump (tab separated) or a CSV with city, state,
+# latitude and longitude columns. Nothing is sent to an outside service.
+#
+# Radius and bounding-box queries are narrowed by a spatial index to the
+# venues inside a box: a GiST index over point(longitude, latitude) on
+# PostgreSQL, an R*Tree maintained by triggers on SQLite. Exact
+# great-circle distances are only computed for the venues in the box.
+#----------------------------------------------------------------------------#
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = EARTH_RADIUS_MILES * math.pi / 180
+
+_rtree = db.table('venue_location',
+    db.column('id'), db.column('min_lat'), db.column('max_lat'), db.column('min_lng'), db.column('max_lng'))
+
+def distance(lat1, lng1, lat2, lng2):
+    # haversine, in miles
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(lat, lng, radius):
+    # (south, west, north, east) around a circle of radius miles; the whole
+    # band of longitudes once the circle reaches a pole
+    dlat = radius / MILES_PER_DEGREE
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+    dlng = min(180.0, dlat / max(math.cos(math.radians(max(abs(south), abs(north)))), 1e-9))
+    return south, lng - dlng, north, lng + dlng
+
+def _boxes(south, west, north, east):
+    # boxes that cross the antimeridian are queried as two
+    if east - west >= 360:
+        return [(south, -180.0, north, 180.0)]
+    west = (west + 180) % 360 - 180
+    east = (east + 180) % 360 - 180
+    if west <= east:
+        return [(south, west, north, east)]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+def _in_box(query, south, west, north, east):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        corner = lambda lng, lat: db.func.point(db.literal(lng), db.literal(lat))
+        return query.filter(
+            db.func.point(Venue.longitude, Venue.latitude).op('<@')(db.func.box(corner(west, south), corner(east, north))))
+    if dialect == 'sqlite':
+        return query.join(_rtree, _rtree.c.id == Venue.id).filter(
+            _rtree.c.min_lat >= south, _rtree.c.max_lat <= north,
+            _rtree.c.min_lng >= west, _rtree.c.max_lng <= east)
+    return query.filter(Venue.latitude.between(south, north), Venue.longitude.between(west, east))
+
+def venues_in_box(south, west, north, east):
+    query = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.latitude,
+        Venue.longitude,
+        Venue.upcoming_shows_count,
+    ).filter(live(Venue))
+    rows = []
+    for box in _boxes(south, west, north, east):
+        # the R*Tree stores 32-bit floats rounded outwards, so recheck
+        rows += [row for row in _in_box(query, *box)
+                 if box[0] <= row.latitude <= box[2] and box[1] <= row.longitude <= box[3]]
+    return rows
+
+def nearby_venues(lat=None, lng=None, radius=None, box=None, limit=None):
+    """Venues within ``radius`` miles of (lat, lng), nearest first, or inside
+    ``box`` = (south, west, north, east) by name."""
+    if limit is None:
+        limit = current_app.config.get('SEARCH_RESULT_LIMIT', 20)
+    if box is None:
+        rows = [(distance(lat, lng, row.latitude, row.longitude), row)
+                for row in venues_in_box(*bounding_box(lat, lng, radius))]
+        rows = sorted((hit for hit in rows if hit[0] <= radius), key=lambda hit: (hit[0], hit[1].id))
+    else:
+        rows = [(None, row) for row in sorted(venues_in_box(*box), key=lambda row: (row.name, row.id))]
+    return {
+        "count": len(rows),
+        "data": [{
+            "id": row.id,
+            "name": row.name,
+            "city": row.city,
+            "state": row.state,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "distance": round(miles, 2) if miles is not None else None,
+            "num_upcoming_shows": row.upcoming_shows_count,
+        } for miles, row in rows[:limit]]
+    }
+
+def nearby_args(args):
+    """nearby_venues() arguments from a query string: lat, lng and radius
+    (miles, default 25), or bbox=west,south,east,north. Raises ValueError
+    (or KeyError) on bad input."""
+    if 'bbox' in args:
+        west, south, east, north = (float(part) for part in args['bbox'].split(','))
+        if not (-90 <= south <= north <= 90 and math.isfinite(west) and math.isfinite(east)):
+            raise ValueError('bbox')
+        return {'box': (south, west, north, east)}
+    lat, lng = float(args['lat']), float(args['lng'])
+    radius = float(args.get('radius', 25))
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < radius <= current_app.config['NEARBY_MAX_RADIUS']):
+        raise ValueError('lat, lng or radius')
+    return {'lat': lat, 'lng': lng, 'radius': radius}
+
+#  Stale locations
+#  ----------------------------------------------------------------
+#  A venue that moves to another city loses its coordinates until the next
+#  geocoding run, rather than being found where it used to be.
+
+@event.listens_for(db.session, 'before_flush')
+def _forget_moved(session, flush_context, instances):
+    for obj in session.dirty:
+        if not isinstance(obj, Venue):
+            continue
+        attrs = inspect(obj).attrs
+        moved = attrs.city.history.has_changes() or attrs.state.history.has_changes()
+        placed = attrs.latitude.history.has_changes() or attrs.longitude.history.has_changes()
+        if moved and not placed:
+            obj.latitude = obj.longitude = None
+
+#  Geocoding
+#  ----------------------------------------------------------------
+
+def _key(city, state):
+    return ' '.join(city.lower().split()), state.strip().upper()
+
+def read_gazetteer(stream, country='US'):
+    """{(city, state): (latitude, longitude)} from a GeoNames dump or a CSV
+    with city, state, latitude and longitude columns. Where GeoNames lists a
+    name twice in one state, the more populous place wins."""
+    first = stream.readline()
+    stream.seek(0)
+    places = {}
+    if '\t' in first:
+        population = {}
+        for fields in csv.reader(stream, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(fields) < 15 or fields[8] != country or fields[6] != 'P':
+                continue
+            point = (float(fields[4]), float(fields[5]))
+            people = int(fields[14] or 0)
+            for name in {fields[1], fields[2]}:
+                key = _key(name, fields[10])
+                if people >= population.get(key, -1):
+                    places[key] = point
+                    population[key] = people
+    else:
+        for row in csv.DictReader(stream):
+            places[_key(row['city'], row['state'])] = (float(row['latitude']), float(row['longitude']))
+    return places
+
+def geocode(places, everything=False, batch_size=1000):
+    """Set the coordinates of venues whose city and state are in ``places``;
+    only venues without coordinates unless ``everything``. Returns
+    (venues geocoded, Counter of (city, state) pairs not found)."""
+    query = db.session.query(Venue.id, Venue.city, Venue.state).order_by(Venue.id)
+    if not everything:
+        query = query.filter(db.or_(Venue.latitude.is_(None), Venue.longitude.is_(None)))
+    updates, missing = [], Counter()
+    for id, city, state in query.all():
+        point = places.get(_key(city, state))
+        if point is None:
+            missing[city, state] += 1
+        else:
+            updates.append({'venue_id': id, 'lat': point[0], 'lng': point[1]})
+    table = Venue.__table__
+    statement = table.update() \
+        .where(table.c.id == db.bindparam('venue_id')) \
+        .values(latitude=db.bindparam('lat'), longitude=db.bindparam('lng'), updated_at=datetime.utcnow())
+    for start in range(0, len(updates), batch_size):
+        db.session.execute(statement, updates[start:start + batch_size])
+        db.session.commit()
+    if updates:
+        # Core updates bypass the session's cache invalidation
+        cache.invalidate(bulk_tags(Venue))
+    return len(updates), missing
+
+
+@click.command('geocode-venues')
+@click.argument('gazetteer', type=click.File('r', encoding='utf-8'))
+@click.option('--country', default='US', show_default=True, help='Country code of the GeoNames rows to use.')
+@click.option('--all', 'everything', is_flag=True, help='Also redo venues that already have coordinates.')
+@with_appcontext
+def geocode_venues(gazetteer, country, everything):
+    """Fill in venue coordinates from a local gazetteer file."""
+    places = read_gazetteer(gazetteer, country)
+    geocoded, missing = geocode(places, everything)
+    click.echo('Geocoded {} venues from {} places.'.format(geocoded, len(places)))
+    if missing:
+        click.echo('No match for {} venues, e.g. {}.'.format(
+            sum(missing.values()),
+            '; '.join('{}, {}'.format(city, state) for (city, state), n in missing.most_common(5))))
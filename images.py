@@ -0,0 +1,304 @@
+import hashlib
+import http.client
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+from flask import Blueprint, current_app, request, redirect, send_file, abort, url_for
+from models import db, Venue, Artist
+from queries import live
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+#----------------------------------------------------------------------------#
+# Image proxy.
+#
+#   /img/artist/3/md?v=1f0c9a2e
+#
+# serves an artist's or venue's image_link scaled down to one of a few
+# fixed sizes. The source is fetched once; the scaled copy is kept in a
+# disk cache under its content hash, least recently used copies going first
+# once the cache outgrows IMAGE_CACHE_MAX_BYTES. Templates build the URLs
+# with image_url(), whose v= names the source link, so the response can be
+# cached as immutable: a new image_link is a new URL. Without Pillow, or
+# with IMAGE_PROXY_ENABLED off, image_url() hands back the source link.
+#
+# Only public addresses are fetched, unless IMAGE_PROXY_ALLOW_PRIVATE (for
+# a local stand-in of the origin in development and tests). A source that
+# cannot be fetched or read redirects to the link itself.
+#----------------------------------------------------------------------------#
+
+# longest side in pixels; tiles are shown at up to 200px, detail pages at
+# up to 500px, so these cover 2x screens
+SIZES = {'sm': 200, 'md': 400, 'lg': 1000}
+
+KINDS = {'venue': Venue, 'artist': Artist}
+
+ONE_YEAR = 365 * 24 * 3600
+# how long an unversioned or outdated URL may be cached
+SHORT_MAX_AGE = 3600
+# a cached copy's last use is recorded at most this often
+TOUCH_INTERVAL = 3600
+
+images = Blueprint('images', __name__)
+
+def version(link):
+    return hashlib.sha1(link.encode('utf-8')).hexdigest()[:8]
+
+@images.app_template_global()
+def image_url(kind, owner_id, link, size='md'):
+    """The proxy URL for ``kind`` ('venue' or 'artist') ``owner_id``'s
+    image ``link`` at ``size``, or the link itself when not proxying."""
+    if not link or Image is None or not current_app.config.get('IMAGE_PROXY_ENABLED', True):
+        return link
+    return url_for('images.image', kind=kind, owner_id=owner_id, size=size, v=version(link))
+
+#  Fetching
+#  ----------------------------------------------------------------
+
+class FetchError(Exception):
+    pass
+
+def _check_url(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise FetchError('not an http(s) URL: {}'.format(url))
+
+def _connect(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    # resolves the host once, checks every address it resolves to, and
+    # connects to one of those very addresses, so a second lookup cannot
+    # swap in a private one (DNS rebinding)
+    host, port = address
+    try:
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as error:
+        raise FetchError('cannot resolve {}: {}'.format(host, error))
+    if not current_app.config.get('IMAGE_PROXY_ALLOW_PRIVATE', False):
+        for *_, sockaddr in addresses:
+            if not ipaddress.ip_address(sockaddr[0].split('%')[0]).is_global:
+                raise FetchError('{} is not a public address'.format(host))
+    error = None
+    for family, type, proto, _, sockaddr in addresses:
+        sock = socket.socket(family, type, proto)
+        try:
+            if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as failed:
+            sock.close()
+            error = failed
+    raise error
+
+class _CheckedHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _connect
+
+class _CheckedHTTPSConnection(http.client.HTTPSConnection):
+    # TLS still verifies the certificate against the host name
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _connect
+
+class _CheckedHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_CheckedHTTPConnection, req)
+
+class _CheckedHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_CheckedHTTPSConnection, req, context=self._context)
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _check_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+# no proxies: the address connected to is the one checked. Every hop of a
+# redirect chain opens a new, checked connection
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), _CheckedHTTPHandler,
+                                      _CheckedHTTPSHandler, _CheckedRedirects)
+
+def fetch(url):
+    """The body of ``url``, at most IMAGE_FETCH_MAX_BYTES long. Raises
+    FetchError."""
+    config = current_app.config
+    _check_url(url)
+    limit = config.get('IMAGE_FETCH_MAX_BYTES', 10 * 1024 * 1024)
+    req = urllib.request.Request(url, headers={'User-Agent': 'fyyur-image-proxy', 'Accept': 'image/*'})
+    try:
+        with _opener.open(req, timeout=config.get('IMAGE_FETCH_TIMEOUT', 5)) as response:
+            body = response.read(limit + 1)
+    except (urllib.error.URLError, OSError, ValueError) as error:
+        raise FetchError('cannot fetch {}: {}'.format(url, error))
+    if len(body) > limit:
+        raise FetchError('{} is larger than {} bytes'.format(url, limit))
+    return body
+
+def resize(body, longest):
+    """``body`` scaled down to fit ``longest`` pixels, as (bytes, mimetype):
+    PNG when it has transparency, JPEG otherwise. Raises FetchError when
+    Pillow cannot read it."""
+    try:
+        image = Image.open(io.BytesIO(body))
+        # lets the JPEG decoder scale down by a power of two while reading
+        image.draft('RGB', (longest, longest))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((longest, longest), Image.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise FetchError('cannot read the image: {}'.format(error))
+    out = io.BytesIO()
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image.save(out, 'PNG', optimize=True)
+        return out.getvalue(), 'image/png'
+    image.convert('RGB').save(out, 'JPEG', quality=85, optimize=True, progressive=True)
+    return out.getvalue(), 'image/jpeg'
+
+#  Disk cache
+#  ----------------------------------------------------------------
+#  blobs/ab/abcdef....jpg holds a scaled image under the hash of its bytes;
+#  refs/12/1234... (the hash of the source link and size) names the blob.
+#  A blob's mtime is its last use. Eviction deletes the oldest blobs; a ref
+#  to a deleted blob reads as a miss until the image is fetched again.
+#
+#  Each process keeps a running total of the blob bytes: the first write
+#  walks the directory once, later writes add to the total, and only a
+#  write that would take it past max_bytes walks the directory again, to
+#  pick the blobs to delete and to take in what other workers wrote.
+
+_MIMETYPES = {'.jpg': 'image/jpeg', '.png': 'image/png'}
+_EXTENSIONS = {mimetype: extension for extension, mimetype in _MIMETYPES.items()}
+
+class DiskCache:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # bytes in blobs/, None until the first walk
+        self.size = None
+
+    def _path(self, kind, name):
+        return os.path.join(self.root, kind, name[:2], name)
+
+    def _write(self, path, data):
+        # readers never see a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        """(open blob file, mimetype, digest) of the blob ``key`` refers to,
+        or None. The caller closes the file."""
+        try:
+            with open(self._path('refs', key)) as f:
+                blob = f.read()
+            # opened before anything else, so eviction cannot pull the
+            # file out from under the response
+            body = open(self._path('blobs', blob), 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            if os.fstat(body.fileno()).st_mtime < time.time() - TOUCH_INTERVAL:
+                os.utime(body.name)
+        except FileNotFoundError:
+            pass
+        name, extension = os.path.splitext(blob)
+        return body, _MIMETYPES[extension], name
+
+    def put(self, key, data, mimetype):
+        name = hashlib.sha256(data).hexdigest()
+        blob = name + _EXTENSIONS[mimetype]
+        path = self._path('blobs', blob)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            # room is made first, so the new copy is never the one evicted
+            self.evict(len(data))
+            self._write(path, data)
+            with self.lock:
+                self.size += len(data)
+        self._write(self._path('refs', key), blob.encode('ascii'))
+        return io.BytesIO(data), mimetype, name
+
+    def _walk(self):
+        # (mtime, size, path) of every blob, and their total size
+        blobs, total = [], 0
+        for directory, _, names in os.walk(os.path.join(self.root, 'blobs')):
+            for name in names:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return blobs, total
+
+    def evict(self, incoming=0):
+        """Delete the least recently used blobs until ``incoming`` more
+        bytes fit in max_bytes, with a tenth to spare."""
+        with self.lock:
+            if self.size is not None and self.size + incoming <= self.max_bytes:
+                return
+            blobs, self.size = self._walk()
+            if self.size + incoming <= self.max_bytes:
+                return
+            for mtime, size, path in sorted(blobs):
+                if self.size + incoming <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self.size -= size
+
+_caches = {}
+
+def disk_cache():
+    config = current_app.config
+    root = config.get('IMAGE_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'fyyur-images')
+    if root not in _caches:
+        _caches[root] = DiskCache(root, config.get('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    return _caches[root]
+
+#  Serving
+#  ----------------------------------------------------------------
+
+@images.route('/img/<any(venue, artist):kind>/<int:owner_id>/<any(sm, md, lg):size>')
+def image(kind, owner_id, size):
+    if Image is None or not current_app.config.get('IMAGE_PROXY_ENABLED', True):
+        abort(404)
+    model = KINDS[kind]
+    link = db.session.query(model.image_link).filter(model.id == owner_id, live(model)).scalar()
+    if not link:
+        abort(404)
+    key = hashlib.sha256('{}\0{}'.format(link, size).encode('utf-8')).hexdigest()
+    cache = disk_cache()
+    found = cache.get(key)
+    if found is None:
+        try:
+            found = cache.put(key, *resize(fetch(link), SIZES[size]))
+        except FetchError as error:
+            current_app.logger.warning('image proxy: %s', error)
+            return redirect(link)
+    body, mimetype, digest = found
+    # the URL names the source, so a new image_link gets a new URL
+    current = request.args.get('v') == version(link)
+    response = send_file(body, mimetype=mimetype, etag=digest, conditional=True,
+                         max_age=ONE_YEAR if current else SHORT_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = current
+    return response
@@ -0,0 +1,266 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime, timezone
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Genre, Venue, Artist, Show, venue_genres, artist_genres
+from cache import cache, bulk_tags
+from search import reset_index
+from scheduling import reset_bookings
+from counters import count_new_shows
+from fulltext import refresh as refresh_documents
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+#   flask import-data venues venues.csv
+#   flask import-data shows shows.jsonl --batch-size 5000 --rejects bad.jsonl
+#
+# Rows are streamed from a CSV or JSON-lines file, validated with the same
+# forms the create pages use, and inserted a batch at a time with a single
+# executemany (or COPY on PostgreSQL). A batch the database refuses is
+# retried row by row so one bad row only rejects itself.
+#----------------------------------------------------------------------------#
+
+KINDS = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm),
+}
+
+GENRE_LINKS = {
+    Venue: (venue_genres, 'venue_id'),
+    Artist: (artist_genres, 'artist_id'),
+}
+
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y', 'on')
+
+def read_rows(stream, format):
+    if format == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+    else:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            # a line that does not parse is passed on as is, for the importer
+            # to reject without giving up on the rest of the file
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+def _formdata(row):
+    # massage a raw row into what the HTML form would have posted
+    data = MultiDict()
+    for name, value in row.items():
+        if value is None or value == '':
+            continue
+        if name == 'genres':
+            genres = value if isinstance(value, list) else value.split(',')
+            for genre in genres:
+                data.add(name, genre.strip())
+        elif name in BOOLEAN_FIELDS:
+            if str(value).strip().lower() in TRUE_VALUES:
+                data.add(name, 'y')
+        elif name == 'start_time':
+            # start times are stored as naive UTC (like updated_at and
+            # database_now()); one with an offset is converted first
+            try:
+                value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+                if value.tzinfo is not None:
+                    value = value.astimezone(timezone.utc).replace(tzinfo=None)
+                value = value.strftime('%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                pass
+            data.add(name, value)
+        else:
+            data.add(name, str(value))
+    return data
+
+
+class Importer:
+    def __init__(self, model, form_class, batch_size=1000, use_copy=False, rejects=None):
+        self.model = model
+        self.form = form_class(meta={'csrf': False})
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.rejects = rejects
+        self.inserted = 0
+        self.rejected = 0
+        self.genre_ids = {}
+
+    def reject(self, line, row, errors):
+        self.rejected += 1
+        if self.rejects is not None:
+            self.rejects.write(json.dumps({'line': line, 'row': row, 'errors': errors}, default=str) + '\n')
+
+    def validate(self, line, row):
+        if not isinstance(row, dict):
+            self.reject(line, row, {'json': ['not a JSON object']})
+            return None
+        self.form.process(_formdata(row))
+        if not self.form.validate():
+            self.reject(line, row, self.form.errors)
+            return None
+        return self.form.column_values()
+
+    def _missing_references(self, batch):
+        # the database only enforces the show foreign keys on PostgreSQL, so
+        # check them up front with one lookup per referenced table
+        missing = set()
+        for column, model in (('artist_id', Artist), ('venue_id', Venue)):
+            ids = {values[column] for line, row, values in batch}
+            found = {id for id, in db.session.query(model.id).filter(model.id.in_(ids))}
+            missing.update((column, id) for id in ids - found)
+        return missing
+
+    def _allocate_ids(self, n):
+        # genre links need the new primary keys, which executemany cannot
+        # return, so reserve them up front
+        if db.engine.dialect.name == 'postgresql':
+            rows = db.session.execute(
+                db.text('SELECT nextval(pg_get_serial_sequence(:table, \'id\')) FROM generate_series(1, :n)'),
+                {'table': '"{}"'.format(self.model.__tablename__), 'n': n},
+            )
+            return [id for id, in rows]
+        start = db.session.query(db.func.coalesce(db.func.max(self.model.id), 0)).scalar()
+        return list(range(start + 1, start + n + 1))
+
+    def _genre_id_list(self, names):
+        missing = [name for name in names if name not in self.genre_ids]
+        if missing:
+            genres = Genre.by_names(missing)
+            db.session.flush()
+            self.genre_ids.update((genre.name, genre.id) for genre in genres)
+        return [self.genre_ids[name] for name in names]
+
+    def _write(self, batch):
+        # COPY skips column defaults, so stamp the rows here
+        now = datetime.utcnow()
+        values = [dict(values, updated_at=now) for line, row, values in batch]
+        if self.model is Show:
+            count_new_shows(values)
+        if self.model not in GENRE_LINKS:
+            self._insert(values)
+            return
+        table, owner_column = GENRE_LINKS[self.model]
+        rows, links = [], []
+        for id, row in zip(self._allocate_ids(len(values)), values):
+            row = dict(row, id=id)
+            for genre_id in self._genre_id_list(row.pop('genres')):
+                links.append({owner_column: id, 'genre_id': genre_id})
+            rows.append(row)
+        self._insert(rows)
+        if links:
+            db.session.execute(table.insert(), links)
+        refresh_documents(self.model, [row['id'] for row in rows])
+
+    def _insert(self, rows):
+        if self.use_copy:
+            self._copy(rows)
+        else:
+            db.session.execute(self.model.__table__.insert(), rows)
+
+    def _copy(self, rows):
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if row[column] is None else row[column] for column in columns])
+        buffer.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert(
+            'COPY "{}" ({}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'.format(
+                self.model.__tablename__, ', '.join(columns)),
+            buffer,
+        )
+
+    def flush(self, batch):
+        if self.model is Show and batch:
+            missing = self._missing_references(batch)
+            if missing:
+                valid = []
+                for line, row, values in batch:
+                    bad = [column for column in ('artist_id', 'venue_id') if (column, values[column]) in missing]
+                    if bad:
+                        self.reject(line, row, {column: ['unknown id'] for column in bad})
+                    else:
+                        valid.append((line, row, values))
+                batch = valid
+        if not batch:
+            return
+        try:
+            self._write(batch)
+            db.session.commit()
+            self.inserted += len(batch)
+        except SQLAlchemyError:
+            db.session.rollback()
+            self.genre_ids.clear()
+            for line, row, values in batch:
+                try:
+                    self._write([(line, row, values)])
+                    db.session.commit()
+                    self.inserted += 1
+                except SQLAlchemyError as error:
+                    db.session.rollback()
+                    self.genre_ids.clear()
+                    self.reject(line, row, {'database': [str(error.orig if hasattr(error, 'orig') else error)]})
+
+    def run(self, rows, progress=None):
+        batch = []
+        for line, row in enumerate(rows, start=1):
+            values = self.validate(line, row)
+            if values is not None:
+                batch.append((line, row, values))
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+                if progress:
+                    progress(self)
+        self.flush(batch)
+        # Core inserts bypass the ORM session events, so drop what the
+        # response cache, search index and booking trees derived from this table
+        cache.invalidate(bulk_tags(Venue, Artist, Show) if self.model is Show else bulk_tags(self.model))
+        if self.model is Show:
+            reset_bookings()
+        else:
+            reset_index(self.model)
+
+
+@click.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT batch.')
+@click.option('--copy', 'use_copy', is_flag=True, help='Use COPY instead of executemany (PostgreSQL only).')
+@click.option('--rejects', type=click.File('w'), help='Write rejected rows and their errors here as JSON lines.')
+@with_appcontext
+def import_data(kind, path, format, batch_size, use_copy, rejects):
+    """Bulk load venues, artists or shows from a CSV or JSON-lines file."""
+    if format is None:
+        format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    if use_copy and db.engine.dialect.name != 'postgresql':
+        raise click.UsageError('--copy needs a PostgreSQL database')
+    model, form_class = KINDS[kind]
+    importer = Importer(model, form_class, batch_size=batch_size, use_copy=use_copy, rejects=rejects)
+    started = time.perf_counter()
+
+    def progress(importer):
+        elapsed = time.perf_counter() - started
+        click.echo('{} inserted, {} rejected, {:.0f} rows/s'.format(
+            importer.inserted, importer.rejected, (importer.inserted + importer.rejected) / elapsed))
+
+    with open(path, newline='', encoding='utf-8') as stream:
+        importer.run(read_rows(stream, format), progress=progress)
+    elapsed = time.perf_counter() - started
+    click.echo('Imported {} {} in {:.1f}s ({:.0f} rows/s), {} rejected.'.format(
+        importer.inserted, kind, elapsed, importer.inserted / elapsed if elapsed else 0, importer.rejected))
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import g, request, current_app, has_request_context, before_render_template, template_rendered, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request instrumentation.
+#
+# When INSTRUMENTATION_ENABLED is set, every request records how many SQL
+# statements it ran, the time spent in the database and in template
+# rendering, and flags statements repeated more than
+# INSTRUMENTATION_N_PLUS_ONE_THRESHOLD times (the usual shape of an N+1).
+# Each response carries a Server-Timing header and the per-endpoint totals
+# are served in Prometheus text format at /_metrics.
+#----------------------------------------------------------------------------#
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+        self.render_stack = []
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.n_plus_one = 0
+
+
+def _current():
+    if has_request_context():
+        return g.get('request_stats')
+    return None
+
+#  SQLAlchemy hooks
+#  ----------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    if stats is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    if stats is None:
+        return
+    started = conn.info.get('query_started')
+    if started:
+        stats.db_time += time.perf_counter() - started.pop()
+    stats.queries += 1
+    stats.statements[statement] += 1
+
+#  Template hooks
+#  ----------------------------------------------------------------
+
+def _before_render(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None:
+        stats.render_stack.append(time.perf_counter())
+
+def _after_render(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None and stats.render_stack:
+        started = stats.render_stack.pop()
+        # nested render_template calls are already inside the outer timing
+        if not stats.render_stack:
+            stats.render_time += time.perf_counter() - started
+
+
+class Instrumentation:
+    _engine_hooks_installed = False
+
+    def __init__(self, app=None):
+        self.endpoints = defaultdict(EndpointStats)
+        self.lock = threading.Lock()
+        self.threshold = 10
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('INSTRUMENTATION_ENABLED', False):
+            return
+        self.threshold = app.config.get('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 10)
+        self.logger = app.logger
+        if not Instrumentation._engine_hooks_installed:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            Instrumentation._engine_hooks_installed = True
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.add_url_rule('/_metrics', 'metrics', self.metrics_view)
+        app.extensions['instrumentation'] = self
+
+    def _start(self):
+        g.request_stats = RequestStats()
+
+    def _finish(self, response):
+        stats = g.pop('request_stats', None)
+        if stats is None:
+            return response
+        duration = time.perf_counter() - stats.started
+        repeated = [(statement, count) for statement, count in stats.statements.items()
+                    if count > self.threshold]
+        for statement, count in repeated:
+            self.logger.warning('possible N+1 in %s: statement ran %d times: %s',
+                                request.endpoint, count, ' '.join(statement.split())[:200])
+
+        with self.lock:
+            endpoint = self.endpoints[request.endpoint or 'unknown']
+            endpoint.requests += 1
+            endpoint.duration += duration
+            endpoint.queries += stats.queries
+            endpoint.db_time += stats.db_time
+            endpoint.render_time += stats.render_time
+            endpoint.n_plus_one += len(repeated)
+
+        response.headers.add('Server-Timing', ', '.join([
+            'db;dur={:.2f};desc="{} queries"'.format(stats.db_time * 1000, stats.queries),
+            'render;dur={:.2f}'.format(stats.render_time * 1000),
+            'total;dur={:.2f}'.format(duration * 1000),
+        ]))
+        return response
+
+    #  Prometheus exposition
+    #  ----------------------------------------------------------------
+
+    METRICS = (
+        ('fyyur_requests_total', 'counter', 'Requests handled.', 'requests'),
+        ('fyyur_request_duration_seconds_total', 'counter', 'Time spent handling requests.', 'duration'),
+        ('fyyur_db_queries_total', 'counter', 'SQL statements executed.', 'queries'),
+        ('fyyur_db_duration_seconds_total', 'counter', 'Time spent waiting on the database.', 'db_time'),
+        ('fyyur_render_duration_seconds_total', 'counter', 'Time spent rendering templates.', 'render_time'),
+        ('fyyur_n_plus_one_total', 'counter', 'Statements repeated above the N+1 threshold.', 'n_plus_one'),
+    )
+
+    def render_metrics(self, extra=()):
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            lines = []
+            for name, type, help, attr in self.METRICS:
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {type}')
+                for endpoint, stats in endpoints:
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {getattr(stats, attr)}')
+        for name, type, help, value in extra:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {type}')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        extra = []
+        cache = current_app.extensions.get('response_cache')
+        if cache is not None:
+            for stat, value in sorted(cache.stats.items()):
+                extra.append((f'fyyur_response_cache_{stat}_total', 'counter', f'Response cache {stat}.', value))
+        pool = current_app.extensions.get('db_pool')
+        if pool is not None:
+            extra.extend(pool.metrics())
+        return Response(self.render_metrics(extra), mimetype='text/plain; version=0.0.4')
+
+
+instrumentation = Instrumentation()
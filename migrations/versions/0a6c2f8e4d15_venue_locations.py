@@ -0,0 +1,63 @@
+"""latitude and longitude on Venue, with a spatial index
+
+Revision ID: 0a6c2f8e4d15
+Revises: f1b7d3e9a604
+Create Date: 2026-10-19 00:08:52.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6c2f8e4d15'
+down_revision = 'f1b7d3e9a604'
+branch_labels = None
+depends_on = None
+
+# the same statements models.py runs on create_all
+LOCATION_DDL = {
+    'postgresql': [
+        'CREATE INDEX ix_venue_location ON "Venue" USING gist (point(longitude, latitude))',
+    ],
+    'sqlite': [
+        'CREATE VIRTUAL TABLE venue_location USING rtree(id, min_lat, max_lat, min_lng, max_lng)',
+        'CREATE TRIGGER venue_location_insert AFTER INSERT ON "Venue" '
+        'WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN '
+        'INSERT INTO venue_location VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude); END',
+        'CREATE TRIGGER venue_location_update AFTER UPDATE OF latitude, longitude ON "Venue" BEGIN '
+        'DELETE FROM venue_location WHERE id = old.id; '
+        'INSERT INTO venue_location SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude '
+        'WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL; END',
+        'CREATE TRIGGER venue_location_delete AFTER DELETE ON "Venue" BEGIN '
+        'DELETE FROM venue_location WHERE id = old.id; END',
+    ],
+}
+
+LOCATION_DROP = {
+    'postgresql': ['DROP INDEX ix_venue_location'],
+    'sqlite': [
+        'DROP TRIGGER venue_location_delete',
+        'DROP TRIGGER venue_location_update',
+        'DROP TRIGGER venue_location_insert',
+        'DROP TABLE venue_location',
+    ],
+}
+
+
+def upgrade():
+    # new nullable columns are added in place, so the triggers below are
+    # not lost to a table rebuild
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+    for statement in LOCATION_DDL.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in LOCATION_DROP.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
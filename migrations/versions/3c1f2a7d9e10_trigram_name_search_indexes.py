@@ -0,0 +1,30 @@
+"""trigram name search indexes
+
+Revision ID: 3c1f2a7d9e10
+Revises: 97f05bcc8f56
+Create Date: 2026-10-18 18:05:12.417730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f2a7d9e10'
+down_revision = '97f05bcc8f56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_venue_name_trgm', 'Venue', ['name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artist_name_trgm', 'Artist', ['name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_venue_name_trgm', table_name='Venue')
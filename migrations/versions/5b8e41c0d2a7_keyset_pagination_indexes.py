@@ -0,0 +1,30 @@
+"""keyset pagination indexes
+
+Revision ID: 5b8e41c0d2a7
+Revises: 3c1f2a7d9e10
+Create Date: 2026-10-18 18:31:40.552018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e41c0d2a7'
+down_revision = '3c1f2a7d9e10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index('ix_venue_state_city', table_name='Venue')
+    op.create_index('ix_venue_state_city_name_id', 'Venue', ['state', 'city', 'name', 'id'], unique=False)
+    op.create_index('ix_artist_name_id', 'Artist', ['name', 'id'], unique=False)
+    op.create_index('ix_show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='Show')
+    op.drop_index('ix_artist_name_id', table_name='Artist')
+    op.drop_index('ix_venue_state_city_name_id', table_name='Venue')
+    op.create_index('ix_venue_state_city', 'Venue', ['state', 'city'], unique=False)
@@ -0,0 +1,87 @@
+"""normalize genres into Genre and association tables
+
+Revision ID: 8d2e6f4a1b93
+Revises: 5b8e41c0d2a7
+Create Date: 2026-10-18 19:12:03.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e6f4a1b93'
+down_revision = '5b8e41c0d2a7'
+branch_labels = None
+depends_on = None
+
+# the form choices at the time of this migration
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+]
+
+OWNERS = (
+    ('Venue', 'venue_genres', 'venue_id'),
+    ('Artist', 'artist_genres', 'artist_id'),
+)
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    links = {}
+    for owner, table, column in OWNERS:
+        links[owner] = op.create_table(table,
+        sa.Column(column, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint([column], [owner + '.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(column, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id_{}'.format(table, column), table, ['genre_id', column], unique=False)
+
+    # convert the comma separated strings into rows
+    bind = op.get_bind()
+    existing = {}
+    for owner, table, column in OWNERS:
+        for id, genres in bind.execute(sa.text('SELECT id, genres FROM "{}"'.format(owner))):
+            existing[owner, id] = [name.strip() for name in (genres or '').split(',') if name.strip()]
+    names = list(dict.fromkeys(GENRES + [name for values in existing.values() for name in values]))
+    op.bulk_insert(genre, [{'name': name} for name in names])
+    genre_ids = {name: id for id, name in bind.execute(sa.text('SELECT id, name FROM "Genre"'))}
+    for owner, table, column in OWNERS:
+        rows = [{column: id, 'genre_id': genre_ids[name]}
+                for (row_owner, id), values in existing.items() if row_owner == owner
+                for name in dict.fromkeys(values)]
+        if rows:
+            op.bulk_insert(links[owner], rows)
+
+    for owner, table, column in OWNERS:
+        with op.batch_alter_table(owner) as batch_op:
+            batch_op.drop_column('genres')
+
+
+def downgrade():
+    bind = op.get_bind()
+    for owner, table, column in OWNERS:
+        with op.batch_alter_table(owner) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(length=120), nullable=True))
+        genres = {}
+        rows = bind.execute(sa.text(
+            'SELECT l.{column}, g.name FROM {table} l JOIN "Genre" g ON g.id = l.genre_id '
+            'ORDER BY l.{column}, g.name'.format(column=column, table=table)))
+        for id, name in rows:
+            genres.setdefault(id, []).append(name)
+        for id, names in genres.items():
+            bind.execute(sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(owner)),
+                         {'genres': ','.join(names), 'id': id})
+        op.drop_index('ix_{}_genre_id_{}'.format(table, column), table_name=table)
+        op.drop_table(table)
+    op.drop_table('Genre')
@@ -0,0 +1,77 @@
+"""full-text search documents for venues and artists
+
+Revision ID: b83d5f0c2e71
+Revises: 0a6c2f8e4d15
+Create Date: 2026-10-19 01:02:17.318450
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83d5f0c2e71'
+down_revision = '0a6c2f8e4d15'
+branch_labels = None
+depends_on = None
+
+# (table, genre link table, owner column, place expression)
+OWNERS = (
+    ('Venue', 'venue_genres', 'venue_id', "coalesce(address, '') || ' ' || city || ' ' || state"),
+    ('Artist', 'artist_genres', 'artist_id', "city || ' ' || state"),
+)
+
+# the same documents fulltext.py builds
+VECTOR_BACKFILL = (
+    'UPDATE "{table}" SET search_vector = '
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce((SELECT string_agg(\"Genre\".name, ' ') FROM {links} "
+    'JOIN "Genre" ON "Genre".id = {links}.genre_id WHERE {links}.{column} = "{table}".id), \'\')), \'B\') || '
+    "setweight(to_tsvector('english', coalesce({place}, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(seeking_description, '')), 'D')"
+)
+
+SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE search_index USING fts5(kind UNINDEXED, owner_id UNINDEXED, "
+    "name, genres, place, seeking, tokenize='porter unicode61')"
+)
+
+SEARCH_INDEX_BACKFILL = (
+    "INSERT INTO search_index SELECT '{kind}', id, name, "
+    '(SELECT group_concat("Genre".name, \' \') FROM {links} '
+    'JOIN "Genre" ON "Genre".id = {links}.genre_id WHERE {links}.{column} = "{table}".id), '
+    '{place}, seeking_description FROM "{table}"'
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    # added in place rather than in a batch, which on SQLite would rebuild
+    # Venue and lose the venue_location triggers
+    for table, links, column, place in OWNERS:
+        op.add_column(table, sa.Column('search_vector',
+            sa.Text().with_variant(postgresql.TSVECTOR(), 'postgresql'), nullable=True))
+        op.create_index('ix_{}_search_vector'.format(table.lower()), table, ['search_vector'], unique=False,
+            postgresql_using='gin')
+        if dialect == 'postgresql':
+            op.execute(VECTOR_BACKFILL.format(table=table, links=links, column=column, place=place))
+    if dialect == 'sqlite':
+        op.execute(SEARCH_INDEX_DDL)
+        for table, links, column, place in OWNERS:
+            op.execute(SEARCH_INDEX_BACKFILL.format(
+                kind=table.lower(), table=table, links=links, column=column, place=place))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TABLE search_index')
+    for table, links, column, place in reversed(OWNERS):
+        op.drop_index('ix_{}_search_vector'.format(table.lower()), table_name=table)
+        if dialect == 'sqlite':
+            # SQLite 3.35+ drops a column in place; a batch rebuild would
+            # lose the venue_location triggers
+            op.execute('ALTER TABLE "{}" DROP COLUMN search_vector'.format(table))
+        else:
+            op.drop_column(table, 'search_vector')
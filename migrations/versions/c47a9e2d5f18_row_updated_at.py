@@ -0,0 +1,37 @@
+"""updated_at on Venue, Artist and Show
+
+Revision ID: c47a9e2d5f18
+Revises: 8d2e6f4a1b93
+Create Date: 2026-10-18 20:41:37.502913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47a9e2d5f18'
+down_revision = '8d2e6f4a1b93'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        now = "timezone('utc', now())"
+    else:
+        now = 'CURRENT_TIMESTAMP'
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute('UPDATE "{}" SET updated_at = {}'.format(table, now))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
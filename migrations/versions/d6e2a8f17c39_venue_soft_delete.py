@@ -0,0 +1,31 @@
+"""soft delete for venues
+
+Revision ID: d6e2a8f17c39
+Revises: b83d5f0c2e71
+Create Date: 2026-10-19 02:11:40.562913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6e2a8f17c39'
+down_revision = 'b83d5f0c2e71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # added in place rather than in a batch, which on SQLite would rebuild
+    # Venue and lose the venue_location triggers
+    op.add_column('Venue', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite 3.35+ drops a column in place; a batch rebuild would lose
+        # the venue_location triggers
+        op.execute('ALTER TABLE "Venue" DROP COLUMN deleted_at')
+    else:
+        op.drop_column('Venue', 'deleted_at')
@@ -0,0 +1,72 @@
+"""Show.end_time, availability windows and overlap constraints
+
+Revision ID: e5a93c1d7b42
+Revises: c47a9e2d5f18
+Create Date: 2026-10-18 22:05:13.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a93c1d7b42'
+down_revision = 'c47a9e2d5f18'
+branch_labels = None
+depends_on = None
+
+OVERLAP_CONSTRAINTS = [
+    (table, column)
+    for table in ('Show', 'Availability')
+    for column in ('venue_id', 'artist_id')
+]
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    # existing shows get the default two hours
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.add_column(sa.Column('end_time', sa.DateTime(), nullable=True))
+    if postgresql:
+        op.execute('UPDATE "Show" SET end_time = start_time + interval \'2 hours\'')
+    else:
+        op.execute('UPDATE "Show" SET end_time = datetime(start_time, \'+2 hours\')')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_table('Availability',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=True),
+    sa.Column('artist_id', sa.Integer(), nullable=True),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('end_time', sa.DateTime(), nullable=False),
+    sa.CheckConstraint('(venue_id IS NULL) <> (artist_id IS NULL)', name='ck_availability_one_owner'),
+    sa.CheckConstraint('end_time > start_time', name='ck_availability_positive'),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_availability_venue_id_start_time', 'Availability', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_availability_artist_id_start_time', 'Availability', ['artist_id', 'start_time'], unique=False)
+
+    if postgresql:
+        # fails, naming both shows, if a venue or artist is already
+        # double-booked; move or delete one of them and run it again
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for table, column in OVERLAP_CONSTRAINTS:
+            op.execute(
+                'ALTER TABLE "{table}" ADD CONSTRAINT ex_{name}_{column}_overlap '
+                'EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&)'
+                .format(table=table, name=table.lower(), column=column)
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE "Show" DROP CONSTRAINT ex_show_venue_id_overlap')
+        op.execute('ALTER TABLE "Show" DROP CONSTRAINT ex_show_artist_id_overlap')
+    op.drop_index('ix_availability_artist_id_start_time', table_name='Availability')
+    op.drop_index('ix_availability_venue_id_start_time', table_name='Availability')
+    op.drop_table('Availability')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_column('end_time')
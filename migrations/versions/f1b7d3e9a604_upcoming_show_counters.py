@@ -0,0 +1,48 @@
+"""upcoming show counters on Venue and Artist
+
+Revision ID: f1b7d3e9a604
+Revises: e5a93c1d7b42
+Create Date: 2026-10-18 23:12:40.671205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b7d3e9a604'
+down_revision = 'e5a93c1d7b42'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.add_column(sa.Column('upcoming', sa.Boolean(), nullable=True))
+    op.execute('UPDATE "Show" SET upcoming = start_time > CURRENT_TIMESTAMP')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.alter_column('upcoming', existing_type=sa.Boolean(), nullable=False)
+    op.create_index('ix_show_upcoming_start_time', 'Show', ['start_time'], unique=False,
+        postgresql_where=sa.text('upcoming'), sqlite_where=sa.text('upcoming'))
+
+    for table, column in OWNERS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(), nullable=True))
+        op.execute(
+            'UPDATE "{table}" SET upcoming_shows_count = '
+            '(SELECT count(*) FROM "Show" WHERE "Show".{column} = "{table}".id AND "Show".upcoming)'
+            .format(table=table, column=column)
+        )
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('upcoming_shows_count', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    for table, column in reversed(OWNERS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('upcoming_shows_count')
+    op.drop_index('ix_show_upcoming_start_time', table_name='Show')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_column('upcoming')
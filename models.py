@@ -0,0 +1,267 @@
+from datetime import datetime
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+class utcnow(FunctionElement):
+    # the database's clock as naive UTC, like every DateTime column here.
+    # now() on PostgreSQL is a timestamptz in the session's TimeZone, so it
+    # is taken to UTC first; SQLite's CURRENT_TIMESTAMP is already UTC
+    type = db.DateTime()
+    inherit_cache = True
+
+@compiles(utcnow)
+def _utcnow(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+@compiles(utcnow, 'postgresql')
+def _utcnow_postgresql(element, compiler, **kw):
+    return "timezone('utc', now())"
+
+# genre membership is looked up from the genre side ("all Jazz venues"), so
+# each association table carries a (genre_id, owner_id) index next to its
+# (owner_id, genre_id) primary key
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def by_names(cls, names):
+        # resolve genre names to rows, creating any that do not exist yet
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        found = {genre.name: genre for genre in cls.query.filter(cls.name.in_(names))}
+        for name in names:
+            if name not in found:
+                found[name] = cls(name=name)
+                db.session.add(found[name])
+        return [found[name] for name in names]
+
+    def __repr__(self):
+        return f'<Genre {self.id} {self.name}>'
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    address = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(500))
+    # shows flagged upcoming, kept by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    # degrees, from `flask geocode-venues`; spatially indexed, see below
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # weighted document for /search on PostgreSQL, kept by fulltext.py
+    search_vector = db.Column(db.Text().with_variant(postgresql.TSVECTOR(), 'postgresql'))
+    # set by delete_venue; the venue is hidden from then on, and removed with
+    # its shows in the background (purge.py)
+    deleted_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    shows = db.relationship('Show', backref='venue', lazy=True)
+    genres = db.relationship('Genre', secondary=venue_genres, lazy='selectin', order_by=Genre.name)
+
+    # the /venues listing pages through venues in area order; name search is
+    # served by a trigram index on PostgreSQL, full-text search by a GIN index
+    __table_args__ = (
+        db.Index('ix_venue_state_city_name_id', 'state', 'city', 'name', 'id'),
+        db.Index('ix_venue_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venue_search_vector', 'search_vector', postgresql_using='gin'),
+    )
+
+    def __repr__(self):
+        return f'<Venue {self.id} {self.name}>'
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website_link = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(500))
+    # shows flagged upcoming, kept by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    # weighted document for /search on PostgreSQL, kept by fulltext.py
+    search_vector = db.Column(db.Text().with_variant(postgresql.TSVECTOR(), 'postgresql'))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    shows = db.relationship('Show', backref='artist', lazy=True)
+    genres = db.relationship('Genre', secondary=artist_genres, lazy='selectin', order_by=Genre.name)
+
+    # /artists pages by (name, id)
+    __table_args__ = (
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artist_search_vector', 'search_vector', postgresql_using='gin'),
+    )
+
+    def __repr__(self):
+        return f'<Artist {self.id} {self.name}>'
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    # counted in its venue's and artist's upcoming_shows_count; cleared by
+    # `flask roll-shows` once the show has started
+    upcoming = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # detail pages split shows on start_time, /shows pages by (start_time,
+    # id), and the roll job looks only at shows still flagged upcoming
+    __table_args__ = (
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_upcoming_start_time', 'start_time',
+            postgresql_where=db.text('upcoming'), sqlite_where=db.text('upcoming')),
+    )
+
+    def __repr__(self):
+        return f'<Show {self.id} artist={self.artist_id} venue={self.venue_id}>'
+
+class Availability(db.Model):
+    # a window in which a venue (or an artist) takes bookings; an owner
+    # without any windows can be booked at any time
+    __tablename__ = 'Availability'
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'))
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'))
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.CheckConstraint('(venue_id IS NULL) <> (artist_id IS NULL)', name='ck_availability_one_owner'),
+        db.CheckConstraint('end_time > start_time', name='ck_availability_positive'),
+        db.Index('ix_availability_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_availability_artist_id_start_time', 'artist_id', 'start_time'),
+    )
+
+    def __repr__(self):
+        return f'<Availability {self.id} venue={self.venue_id} artist={self.artist_id}>'
+
+# updated_at (UTC) versions a row for conditional GETs. onupdate only fires
+# when the row itself is UPDATEd, so a change that only touches a collection,
+# such as the genres, bumps it here
+@event.listens_for(db.session, 'before_flush')
+def _touch(session, flush_context, instances):
+    now = datetime.utcnow()
+    for obj in session.dirty:
+        if isinstance(obj, (Venue, Artist, Show)) and session.is_modified(obj):
+            obj.updated_at = now
+
+# the counters, the booking trees and the response cache all read the venue,
+# artist and flag a show had before a write from its attribute history. A
+# value expired by the last commit is not in that history unless it is
+# loaded before it is replaced, which active_history does
+def _keep_history(target, value, oldvalue, initiator):
+    return value
+
+for _attr in (Show.venue_id, Show.artist_id, Show.upcoming):
+    event.listen(_attr, 'set', _keep_history, active_history=True)
+
+# the trigram operator classes need pg_trgm before the first table is created,
+# and the exclusion constraints below need btree_gist for the = on the ids
+event.listen(
+    db.Model.metadata, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+event.listen(
+    db.Model.metadata, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql')
+)
+
+# no venue or artist is booked twice at once, and an owner's availability
+# windows do not overlap. The GiST indexes behind these constraints also
+# answer the overlap lookups in scheduling.py
+def overlap_constraint(table, column):
+    return (
+        'ALTER TABLE "{table}" ADD CONSTRAINT ex_{name}_{column}_overlap '
+        'EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&)'
+    ).format(table=table, name=table.lower(), column=column)
+
+for _table in (Show.__table__, Availability.__table__):
+    for _column in ('venue_id', 'artist_id'):
+        event.listen(
+            _table, 'after_create',
+            DDL(overlap_constraint(_table.name, _column)).execute_if(dialect='postgresql')
+        )
+
+# venue locations: a GiST index over point(longitude, latitude) on
+# PostgreSQL, an R*Tree kept in step by triggers on SQLite (geo.py)
+VENUE_LOCATION_DDL = {
+    'postgresql': [
+        'CREATE INDEX ix_venue_location ON "Venue" USING gist (point(longitude, latitude))',
+    ],
+    'sqlite': [
+        'CREATE VIRTUAL TABLE venue_location USING rtree(id, min_lat, max_lat, min_lng, max_lng)',
+        'CREATE TRIGGER venue_location_insert AFTER INSERT ON "Venue" '
+        'WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN '
+        'INSERT INTO venue_location VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude); END',
+        'CREATE TRIGGER venue_location_update AFTER UPDATE OF latitude, longitude ON "Venue" BEGIN '
+        'DELETE FROM venue_location WHERE id = old.id; '
+        'INSERT INTO venue_location SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude '
+        'WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL; END',
+        'CREATE TRIGGER venue_location_delete AFTER DELETE ON "Venue" BEGIN '
+        'DELETE FROM venue_location WHERE id = old.id; END',
+    ],
+}
+
+for _dialect, _statements in VENUE_LOCATION_DDL.items():
+    for _statement in _statements:
+        event.listen(Venue.__table__, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
+
+# full-text search on SQLite, where there is no tsvector: an FTS5 table with
+# one document per venue and artist, kept by fulltext.py
+SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE search_index USING fts5(kind UNINDEXED, owner_id UNINDEXED, "
+    "name, genres, place, seeking, tokenize='porter unicode61')"
+)
+
+event.listen(db.Model.metadata, 'after_create', DDL(SEARCH_INDEX_DDL).execute_if(dialect='sqlite'))
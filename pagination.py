@@ -0,0 +1,124 @@
+import base64
+import json
+from datetime import datetime
+from flask import request, abort, url_for
+from models import db
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#
+# Pages are addressed by the sort key of the row on either edge of the
+# current page (?after=<cursor> / ?before=<cursor>) rather than an OFFSET,
+# so the database seeks straight into the index and every page costs the
+# same as the first one.
+#----------------------------------------------------------------------------#
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    raise TypeError(f'cannot encode {value!r} in a cursor')
+
+def _decode_value(obj):
+    if '$dt' in obj:
+        return datetime.fromisoformat(obj['$dt'])
+    return obj
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), default=_encode_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw, object_hook=_decode_value)
+    except ValueError:
+        raise ValueError(f'malformed cursor {cursor!r}')
+    if not isinstance(values, list):
+        raise ValueError(f'malformed cursor {cursor!r}')
+    return values
+
+
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+class Keyset:
+    def __init__(self, per_page, after=None, before=None):
+        self.per_page = per_page
+        self.after = after
+        self.before = before
+
+    @classmethod
+    def from_request(cls, per_page):
+        try:
+            after = request.args.get('after')
+            before = request.args.get('before')
+            return cls(
+                per_page,
+                after=decode_cursor(after) if after else None,
+                before=decode_cursor(before) if before else None,
+            )
+        except ValueError:
+            abort(400)
+
+    @property
+    def backwards(self):
+        return self.before is not None
+
+    def order_by(self, *keys):
+        return [key.desc() if self.backwards else key.asc() for key in keys]
+
+    def _check(self, cursor, keys):
+        # a cursor from another listing, or one edited by hand, would reach
+        # the database as a malformed row comparison
+        if len(cursor) != len(keys):
+            abort(400)
+        for value, key in zip(cursor, keys):
+            try:
+                expected = key.type.python_type
+            except NotImplementedError:
+                continue
+            if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+                abort(400)
+
+    def apply(self, query, *keys):
+        # rows come back in key order for the direction of travel, i.e.
+        # descending when walking backwards from a ``before`` cursor
+        for cursor in (self.after, self.before):
+            if cursor is not None:
+                self._check(cursor, keys)
+        if self.backwards:
+            query = query.filter(db.tuple_(*keys) < tuple(self.before))
+        elif self.after is not None:
+            query = query.filter(db.tuple_(*keys) > tuple(self.after))
+        return query.order_by(*self.order_by(*keys)).limit(self.per_page + 1)
+
+    def page(self, rows, key):
+        rows = list(rows)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if self.backwards:
+            rows.reverse()
+        if not rows:
+            return Page(rows)
+        has_next = more if not self.backwards else True
+        has_prev = more if self.backwards else self.after is not None
+        return Page(
+            rows,
+            next_cursor=encode_cursor(key(rows[-1])) if has_next else None,
+            prev_cursor=encode_cursor(key(rows[0])) if has_prev else None,
+        )
+
+
+def page_url(**cursor):
+    # link to the same listing with the other query arguments kept
+    args = {name: value for name, value in request.args.items() if name not in ('after', 'before')}
+    args.update(request.view_args or {})
+    args.update(cursor)
+    return url_for(request.endpoint, **args)
@@ -0,0 +1,129 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, NullPool
+
+#----------------------------------------------------------------------------#
+# Database connection pool.
+#
+# Builds SQLALCHEMY_ENGINE_OPTIONS from the DATABASE_POOL_* settings and
+# swaps in pool classes that count how long requests wait for a connection
+# and how many are checked out, so pool exhaustion shows up in /_metrics
+# before it shows up as timeouts.
+#----------------------------------------------------------------------------#
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.checkouts = 0
+            self.checkout_wait = 0.0
+            self.checkout_wait_max = 0.0
+            self.timeouts = 0
+            self.in_use = 0
+            self.connects = 0
+            self.invalidations = 0
+
+    def checked_out(self, wait):
+        with self.lock:
+            self.checkouts += 1
+            self.checkout_wait += wait
+            self.checkout_wait_max = max(self.checkout_wait_max, wait)
+            self.in_use += 1
+
+    def checked_in(self):
+        with self.lock:
+            self.in_use -= 1
+
+    def timed_out(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def metrics(self):
+        with self.lock:
+            return [
+                ('fyyur_db_pool_checkouts_total', 'counter', 'Connections checked out of the pool.', self.checkouts),
+                ('fyyur_db_pool_checkout_wait_seconds_total', 'counter', 'Time spent waiting for a pooled connection.', self.checkout_wait),
+                ('fyyur_db_pool_checkout_wait_seconds_max', 'gauge', 'Longest wait for a pooled connection.', self.checkout_wait_max),
+                ('fyyur_db_pool_timeouts_total', 'counter', 'Checkouts that gave up after DATABASE_POOL_TIMEOUT.', self.timeouts),
+                ('fyyur_db_pool_in_use', 'gauge', 'Connections currently checked out.', self.in_use),
+                ('fyyur_db_pool_connects_total', 'counter', 'New database connections opened.', self.connects),
+                ('fyyur_db_pool_invalidations_total', 'counter', 'Connections discarded as dead or stale.', self.invalidations),
+            ]
+
+
+stats = PoolStats()
+
+#  Pools
+#  ----------------------------------------------------------------
+
+class _Monitored:
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            stats.timed_out()
+            raise
+        stats.checked_out(time.perf_counter() - started)
+        return connection
+
+    def _do_return_conn(self, connection):
+        stats.checked_in()
+        super()._do_return_conn(connection)
+
+
+class MonitoredQueuePool(_Monitored, QueuePool):
+    pass
+
+
+class MonitoredNullPool(_Monitored, NullPool):
+    pass
+
+
+def _connected(dbapi_connection, connection_record):
+    with stats.lock:
+        stats.connects += 1
+
+def _invalidated(dbapi_connection, connection_record, exception):
+    with stats.lock:
+        stats.invalidations += 1
+
+for _pool_class in (MonitoredQueuePool, MonitoredNullPool):
+    event.listen(_pool_class, 'connect', _connected)
+    event.listen(_pool_class, 'invalidate', _invalidated)
+
+#  Engine options
+#  ----------------------------------------------------------------
+
+def engine_options(config):
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        # an in-memory database has to stay on Flask-SQLAlchemy's single
+        # shared connection; a file is opened per checkout either way
+        if url.database in (None, '', ':memory:'):
+            return {}
+        return {'poolclass': MonitoredNullPool}
+    if config.get('DATABASE_PGBOUNCER'):
+        # PgBouncer already pools and pings; psycopg2 never prepares
+        # statements server side, so nothing else outlives a transaction
+        return {'poolclass': MonitoredNullPool}
+    return {
+        'poolclass': MonitoredQueuePool,
+        'pool_size': config.get('DATABASE_POOL_SIZE', 5),
+        'max_overflow': config.get('DATABASE_POOL_MAX_OVERFLOW', 10),
+        'pool_recycle': config.get('DATABASE_POOL_RECYCLE', -1),
+        'pool_pre_ping': config.get('DATABASE_POOL_PRE_PING', False),
+        'pool_timeout': config.get('DATABASE_POOL_TIMEOUT', 30),
+    }
+
+def init_app(app):
+    # explicit SQLALCHEMY_ENGINE_OPTIONS still win over the pool settings
+    options = engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.extensions['db_pool'] = stats
@@ -0,0 +1,128 @@
+import threading
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db, Venue, Show, Availability
+from cache import cache
+from counters import count_deleted_shows
+from scheduling import forget_shows
+
+#----------------------------------------------------------------------------#
+# Venue deletion.
+#
+# delete_venue only flags the venue (Venue.deleted_at), which hides it from
+# every page, listing and search at once, and hands the rest to a
+# background thread: the venue's shows go in DELETEs of
+# VENUE_PURGE_BATCH_SIZE rows, a transaction each, so no lock on the shows
+# is held for long, and the venue row goes last. A purge cut short (the
+# worker stopped) is finished by
+#
+#   flask purge-venues
+#
+# which deletes whatever flagged venues are left; run it from cron next to
+# `flask roll-shows`.
+#----------------------------------------------------------------------------#
+
+def _delete_batch(venue_id, batch_size):
+    # one transaction: up to batch_size of the venue's shows, off the
+    # counters and the booking trees. Returns the number deleted
+    show = Show.__table__
+    rows = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.upcoming, Show.start_time, Show.end_time) \
+        .filter(Show.venue_id == venue_id) \
+        .order_by(Show.id) \
+        .limit(batch_size) \
+        .with_for_update(skip_locked=True) \
+        .all()
+    if not rows:
+        return 0
+    deleted = db.session.execute(show.delete().where(show.c.id.in_([row.id for row in rows]))).rowcount
+    if deleted != len(rows):
+        # another purge took some of these rows first; their counters are
+        # its to adjust, so read the batch again
+        db.session.rollback()
+        return -1
+    rows = [row._asdict() for row in rows]
+    count_deleted_shows(rows)
+    forget_shows(rows)
+    db.session.commit()
+    # Core deletes bypass the session's cache invalidation; the artists'
+    # counters changed
+    cache.invalidate(['Show'] + ['Artist:{}'.format(id) for id in {row['artist_id'] for row in rows}])
+    return deleted
+
+def purge_venue(venue_id, batch_size=1000, pause=0.0):
+    """Delete a flagged venue's shows a batch per transaction, then the
+    venue. Returns (shows deleted, whether the venue went too): a venue
+    whose last shows are locked by another transaction is left for the
+    next run."""
+    purged = 0
+    while True:
+        deleted = _delete_batch(venue_id, batch_size)
+        if deleted == 0:
+            break
+        purged += max(deleted, 0)
+        if pause:
+            time.sleep(pause)
+    # an empty batch may only mean the rest were skipped as locked
+    if db.session.query(db.exists().where(Show.venue_id == venue_id)).scalar():
+        db.session.rollback()
+        return purged, False
+    venue = Venue.query.filter(Venue.id == venue_id, Venue.deleted_at.isnot(None)).first()
+    if venue is None:
+        db.session.rollback()
+        return purged, False
+    # SQLite does not enforce the cascade
+    db.session.execute(Availability.__table__.delete().where(Availability.venue_id == venue_id))
+    db.session.delete(venue)
+    db.session.commit()
+    return purged, True
+
+def purge_deleted_venues(batch_size=1000, pause=0.0):
+    """purge_venue() every flagged venue. Returns (venues deleted, shows
+    deleted, venues left for a later run)."""
+    ids = [id for id, in db.session.query(Venue.id).filter(Venue.deleted_at.isnot(None)).order_by(Venue.id)]
+    db.session.commit()
+    venues = shows = 0
+    for id in ids:
+        purged, done = purge_venue(id, batch_size, pause)
+        shows += purged
+        venues += done
+    return venues, shows, len(ids) - venues
+
+#  Background thread
+#  ----------------------------------------------------------------
+
+_running = set()
+_lock = threading.Lock()
+
+def _run(app, venue_id):
+    with app.app_context():
+        try:
+            purge_venue(venue_id, app.config['VENUE_PURGE_BATCH_SIZE'], app.config['VENUE_PURGE_PAUSE'])
+        except Exception:
+            db.session.rollback()
+            app.logger.exception('could not purge venue %s; `flask purge-venues` will retry', venue_id)
+        finally:
+            with _lock:
+                _running.discard(venue_id)
+
+def start_purge(venue_id):
+    """Purge a flagged venue in a background thread of this process."""
+    with _lock:
+        if venue_id in _running:
+            return
+        _running.add(venue_id)
+    threading.Thread(target=_run, args=(current_app._get_current_object(), venue_id),
+                     name='purge-venue-{}'.format(venue_id), daemon=True).start()
+
+
+@click.command('purge-venues')
+@click.option('--batch-size', default=1000, show_default=True, help='Shows per transaction.')
+@with_appcontext
+def purge_venues(batch_size):
+    """Finish deleting venues flagged by delete_venue."""
+    venues, shows, left = purge_deleted_venues(batch_size)
+    click.echo('Deleted {} venues and {} shows.'.format(venues, shows))
+    if left:
+        click.echo('{} venues still have shows locked by other transactions; run again later.'.format(left))
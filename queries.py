@@ -0,0 +1,232 @@
+from itertools import groupby
+from models import db, utcnow, Genre, Venue, Artist, Show, venue_genres, artist_genres
+
+#----------------------------------------------------------------------------#
+# Read queries shared by the controllers.
+#----------------------------------------------------------------------------#
+
+def genre_names(entity):
+    return [genre.name for genre in entity.genres]
+
+_genre_links = {
+    Venue: (venue_genres, venue_genres.c.venue_id),
+    Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+def live(model):
+    # deleted venues are hidden until purge.py has removed them
+    if model is Venue:
+        return Venue.deleted_at.is_(None)
+    return db.true()
+
+def with_genre(query, model, genre):
+    # restrict to one genre through the (genre_id, owner_id) association index
+    if not genre:
+        return query
+    table, owner_id = _genre_links[model]
+    genre_id = db.session.query(Genre.id).filter(Genre.name == genre).scalar_subquery()
+    return query.join(table, owner_id == model.id).filter(table.c.genre_id == genre_id)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+def venue_areas(keyset, genre=None):
+    # the page of venues is read off the (state, city, name, id) index; the
+    # upcoming counts are columns of the venue rows, so there is no join to
+    # the shows. Rows stay in area order so they fold into the areas
+    # structure as they stream in
+    rows = keyset.apply(
+        with_genre(db.session.query(
+            Venue.id,
+            Venue.name,
+            Venue.city,
+            Venue.state,
+            Venue.upcoming_shows_count.label('num_upcoming_shows'),
+        ).filter(live(Venue)), Venue, genre),
+        Venue.state, Venue.city, Venue.name, Venue.id,
+    )
+
+    page = keyset.page(rows, key=lambda row: (row.state, row.city, row.name, row.id))
+    areas = []
+    for (city, state), area_rows in groupby(page.items, key=lambda row: (row.city, row.state)):
+        areas.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": row.id,
+                "name": row.name,
+                "num_upcoming_shows": row.num_upcoming_shows,
+            } for row in area_rows]
+        })
+    page.items = areas
+    return page
+
+#  Artists
+#  ----------------------------------------------------------------
+
+def artist_list(keyset, genre=None):
+    rows = keyset.apply(
+        with_genre(db.session.query(Artist.id, Artist.name), Artist, genre),
+        Artist.name, Artist.id,
+    )
+    page = keyset.page(rows, key=lambda row: (row.name, row.id))
+    page.items = [{
+        "id": row.id,
+        "name": row.name,
+    } for row in page.items]
+    return page
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def show_list(keyset):
+    rows = keyset.apply(
+        db.session.query(
+            Show.id,
+            Show.start_time,
+            Venue.id.label('venue_id'),
+            Venue.name.label('venue_name'),
+            Artist.id.label('artist_id'),
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+            Show.updated_at,
+            Venue.updated_at.label('venue_updated_at'),
+            Artist.updated_at.label('artist_updated_at'),
+        ).join(Venue, Venue.id == Show.venue_id) \
+            .join(Artist, Artist.id == Show.artist_id) \
+            .filter(live(Venue)),
+        Show.start_time, Show.id,
+    )
+    page = keyset.page(rows, key=lambda row: (row.start_time, row.id))
+    page.items = [{
+        "id": row.id,
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time.isoformat(),
+        "updated_at": max(row.updated_at, row.venue_updated_at, row.artist_updated_at).isoformat(),
+    } for row in page.items]
+    return page
+
+#  Detail pages
+#  ----------------------------------------------------------------
+#  A detail page is one query: the entity LEFT JOIN (its shows JOIN the
+#  counterpart of each show), which leaves out shows at a deleted venue. The
+#  database flags each show as upcoming or past and counts both sides with
+#  window aggregates, so Python only has to drop each row into the right
+#  list.
+
+def _shows_join(counterpart, counterpart_fk):
+    return db.join(Show, counterpart, db.and_(counterpart.id == counterpart_fk, live(counterpart)))
+
+def _shows_with_counterpart(model, entity_id, show_fk, counterpart, counterpart_fk):
+    upcoming = Show.start_time > utcnow()
+    return db.session.query(
+        model,
+        Show.id.label('show_id'),
+        Show.start_time,
+        Show.updated_at.label('show_updated_at'),
+        counterpart.id.label('counterpart_id'),
+        counterpart.name.label('counterpart_name'),
+        counterpart.image_link.label('counterpart_image_link'),
+        counterpart.updated_at.label('counterpart_updated_at'),
+        upcoming.label('upcoming'),
+        db.func.count(Show.id).filter(upcoming).over().label('upcoming_shows_count'),
+        db.func.count(Show.id).filter(~upcoming).over().label('past_shows_count'),
+    ).outerjoin(_shows_join(counterpart, counterpart_fk), show_fk == model.id) \
+        .filter(model.id == entity_id, live(model)) \
+        .order_by(Show.start_time) \
+        .all()
+
+def _partition_shows(rows, prefix):
+    past_shows, upcoming_shows = [], []
+    for row in rows:
+        if row.start_time is None:
+            continue
+        show = {
+            "id": row.show_id,
+            prefix + "_id": row.counterpart_id,
+            prefix + "_name": row.counterpart_name,
+            prefix + "_image_link": row.counterpart_image_link,
+            "start_time": row.start_time.isoformat(),
+            "updated_at": max(row.show_updated_at, row.counterpart_updated_at).isoformat(),
+        }
+        (upcoming_shows if row.upcoming else past_shows).append(show)
+    return {
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": rows[0].past_shows_count,
+        "upcoming_shows_count": rows[0].upcoming_shows_count,
+    }
+
+def venue_detail(venue_id):
+    rows = _shows_with_counterpart(Venue, venue_id, Show.venue_id, Artist, Show.artist_id)
+    if not rows:
+        return None
+    venue = rows[0].Venue
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": genre_names(venue),
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "latitude": venue.latitude,
+        "longitude": venue.longitude,
+    }
+    data.update(_partition_shows(rows, "artist"))
+    return data
+
+def artist_detail(artist_id):
+    rows = _shows_with_counterpart(Artist, artist_id, Show.artist_id, Venue, Show.venue_id)
+    if not rows:
+        return None
+    artist = rows[0].Artist
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": genre_names(artist),
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+    }
+    data.update(_partition_shows(rows, "venue"))
+    return data
+
+#  Versions
+#  ----------------------------------------------------------------
+#  What a detail page shows changes when the entity, one of its shows or a
+#  show's counterpart is written, when a show is deleted (the count drops)
+#  or when a show moves from upcoming to past. One aggregate row captures all
+#  of that, so a conditional GET is answered without loading the shows.
+
+def _version(model, entity_id, show_fk, counterpart, counterpart_fk):
+    return db.session.query(
+        model.updated_at,
+        db.func.max(Show.updated_at).label('shows_updated_at'),
+        db.func.max(counterpart.updated_at).label('counterparts_updated_at'),
+        db.func.count(Show.id).label('shows_count'),
+        db.func.max(Show.start_time).filter(Show.start_time <= utcnow()).label('last_past_show'),
+    ).outerjoin(_shows_join(counterpart, counterpart_fk), show_fk == model.id) \
+        .filter(model.id == entity_id, live(model)) \
+        .group_by(model.id, model.updated_at) \
+        .first()
+
+def venue_version(venue_id):
+    return _version(Venue, venue_id, Show.venue_id, Artist, Show.artist_id)
+
+def artist_version(artist_id):
+    return _version(Artist, artist_id, Show.artist_id, Venue, Show.venue_id)
@@ -0,0 +1,113 @@
+import itertools
+import os
+import sqlite3
+import threading
+import click
+from flask import g, request, session, has_request_context, current_app
+from flask.cli import with_appcontext
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+from sqlalchemy.engine import make_url
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#
+# With SQLALCHEMY_REPLICA_URIS set, GET and HEAD requests (and POST views
+# marked @replica_reads, such as the search forms) read from a replica,
+# picked round-robin, one per request so a page sees a single snapshot.
+# Everything else -- writes, flushes, CLI commands -- uses the primary. A GET that carries a flashed message is the redirect that
+# follows a write, so it also reads from the primary and the user sees what
+# they just saved even while the replicas lag.
+#
+# Trying it locally with two SQLite files:
+#
+#   export DATABASE_URL=sqlite:///fyyur.db
+#   export DATABASE_REPLICA_URLS=sqlite:///fyyur-replica.db
+#   flask db upgrade && flask sync-replicas
+#
+# Listing pages now read fyyur-replica.db; after an edit the redirected
+# detail page shows the change from fyyur.db, and the listings only catch
+# up on the next `flask sync-replicas`. tests/test_routing.py runs the same
+# setup.
+#----------------------------------------------------------------------------#
+
+def replica_bind_keys(app):
+    return ['replica-{}'.format(i) for i in range(len(app.config.get('SQLALCHEMY_REPLICA_URIS') or ()))]
+
+def replica_reads(view):
+    # for POST views that only read, e.g. a search form
+    view.replica_reads = True
+    return view
+
+def _reads_from_replica():
+    if not has_request_context():
+        return False
+    if request.method not in ('GET', 'HEAD'):
+        view = current_app.view_functions.get(request.endpoint)
+        return getattr(view, 'replica_reads', False)
+    return '_flashes' not in session
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # execute(..., bind_arguments={'bind': db.engine}) pins a read to
+        # the primary
+        if bind is not None:
+            return bind
+        if not self._flushing and _reads_from_replica():
+            replica = self.app.extensions['db_replicas'].engine_for_request()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        # replicas are ordinary Flask-SQLAlchemy binds, so they get the same
+        # pool settings; no table is mapped to them, so create_all and the
+        # migrations only ever touch the primary
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        for key, uri in zip(replica_bind_keys(app), app.config.get('SQLALCHEMY_REPLICA_URIS') or ()):
+            binds[key] = uri
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.extensions['db_replicas'] = Replicas(self, app)
+        super().init_app(app)
+
+
+class Replicas:
+    def __init__(self, db, app):
+        self.db = db
+        self.app = app
+        self.keys = replica_bind_keys(app)
+        self.cycle = itertools.cycle(self.keys)
+        self.lock = threading.Lock()
+
+    def engine_for_request(self):
+        if not self.keys:
+            return None
+        if 'db_replica' not in g:
+            with self.lock:
+                g.db_replica = next(self.cycle)
+        return self.db.get_engine(self.app, bind=g.db_replica)
+
+
+@click.command('sync-replicas')
+@with_appcontext
+def sync_replicas():
+    """Copy the primary SQLite database over each replica (local testing only)."""
+    primary = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    replicas = [make_url(uri) for uri in current_app.config.get('SQLALCHEMY_REPLICA_URIS') or ()]
+    if primary.get_backend_name() != 'sqlite' or any(url.get_backend_name() != 'sqlite' for url in replicas):
+        raise click.UsageError('sync-replicas only copies SQLite files; use streaming replication on PostgreSQL')
+    # relative paths are resolved against the app like Flask-SQLAlchemy does
+    path = lambda url: os.path.join(current_app.root_path, url.database)
+    source = sqlite3.connect(path(primary))
+    for url in replicas:
+        target = sqlite3.connect(path(url))
+        source.backup(target)
+        target.close()
+        click.echo('Copied {} to {}'.format(path(primary), path(url)))
+    source.close()
@@ -0,0 +1,462 @@
+import random
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect
+from models import db, Venue, Artist, Show, Availability
+from counters import count_new_shows
+from queries import live
+
+#----------------------------------------------------------------------------#
+# Scheduling.
+#
+# A show holds its venue and its artist from start_time to end_time, and
+# neither can be double-booked. Venues and artists may also publish
+# availability windows; once they have any, a show has to fit inside one.
+#
+# On PostgreSQL both rules are exclusion constraints over
+# tsrange(start_time, end_time), and the GiST indexes behind them answer the
+# overlap lookups here. Other databases (SQLite in development) have no
+# range index, so each venue's and artist's bookings are loaded on first use
+# into an in-process interval tree, kept current from the session like the
+# search index. Either way a check costs O(log n) in the size of the
+# calendar.
+#
+# The trees are for a single development process only: they follow this
+# process's commits, not other workers'. With more than one worker on
+# SQLite, set SCHEDULE_INDEX_MAX_OWNERS=0, which checks every booking with a
+# query instead. Either way the bookings and availability windows are read
+# from the primary, never from a replica.
+#----------------------------------------------------------------------------#
+
+_owner_fk = {
+    Venue: (Show.venue_id, Availability.venue_id),
+    Artist: (Show.artist_id, Availability.artist_id),
+}
+
+class _Node:
+    __slots__ = ('item', 'start', 'end', 'key', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, start, end, key):
+        self.item = (start, end, key)
+        self.start = start
+        self.end = end
+        self.key = key
+        self.priority = random.random()
+        self.max_end = end
+        self.left = None
+        self.right = None
+
+    def update(self):
+        self.max_end = self.end
+        for child in (self.left, self.right):
+            if child is not None and child.max_end > self.max_end:
+                self.max_end = child.max_end
+
+
+def _split(node, item, inclusive=False):
+    # (nodes before item, the rest); with inclusive, item itself goes left
+    if node is None:
+        return None, None
+    if node.item < item or (inclusive and node.item == item):
+        left, right = _split(node.right, item, inclusive)
+        node.right = left
+        node.update()
+        return node, right
+    left, right = _split(node.left, item, inclusive)
+    node.left = right
+    node.update()
+    return left, node
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+class IntervalTree:
+    """Half-open [start, end) intervals, each with a key, in a treap ordered
+    by start. Every node records the latest end below it, so an overlap query
+    skips whole subtrees that finish too early: O(log n + k) expected."""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, start, end, key):
+        node = _Node(start, end, key)
+        left, right = _split(self.root, node.item)
+        self.root = _merge(_merge(left, node), right)
+        self.size += 1
+
+    def discard(self, start, end, key):
+        left, rest = _split(self.root, (start, end, key))
+        found, right = _split(rest, (start, end, key), inclusive=True)
+        if found is not None:
+            self.size -= 1
+        self.root = _merge(left, right)
+
+    def overlapping(self, start, end):
+        # (start, end, key) of every interval overlapping [start, end), by start
+        found = []
+        def visit(node):
+            if node is None or node.max_end <= start:
+                return
+            visit(node.left)
+            if node.start < end:
+                if node.end > start:
+                    found.append(node.item)
+                visit(node.right)
+        visit(self.root)
+        return found
+
+
+class Bookings:
+    # interval trees of shows for the most recently used venues or artists
+    def __init__(self, model, max_owners=1024):
+        self.model = model
+        self.column = _owner_fk[model][0]
+        self.max_owners = max_owners
+        self.trees = OrderedDict()
+        self.lock = threading.Lock()
+
+    def tree(self, owner_id):
+        # call with the lock held
+        tree = self.trees.get(owner_id)
+        if tree is not None:
+            self.trees.move_to_end(owner_id)
+            return tree
+        tree = IntervalTree()
+        rows = _primary(db.select(Show.start_time, Show.end_time, Show.id).where(self.column == owner_id))
+        for start, end, id in rows:
+            tree.add(start, end, id)
+        self.trees[owner_id] = tree
+        while len(self.trees) > self.max_owners:
+            self.trees.popitem(last=False)
+        return tree
+
+    def overlapping(self, owner_id, start, end):
+        with self.lock:
+            return self.tree(owner_id).overlapping(start, end)
+
+    def apply(self, changes):
+        # only owners already loaded are updated; the rest load fresh
+        with self.lock:
+            for change, owner_id, interval in changes:
+                tree = self.trees.get(owner_id)
+                if tree is None:
+                    continue
+                if change == 'add':
+                    tree.add(*interval)
+                elif change == 'discard':
+                    tree.discard(*interval)
+                else:
+                    del self.trees[owner_id]
+
+    def clear(self):
+        with self.lock:
+            self.trees.clear()
+
+
+_bookings = {}
+
+def _primary(statement):
+    # a replica may lag behind the bookings the check has to see
+    return db.session.execute(statement, bind_arguments={'bind': db.engine})
+
+def bookings(model):
+    if model not in _bookings:
+        _bookings[model] = Bookings(model, current_app.config.get('SCHEDULE_INDEX_MAX_OWNERS', 1024))
+    return _bookings[model]
+
+#  Index maintenance
+#  ----------------------------------------------------------------
+#  New and deleted shows are collected per flush and applied once the
+#  transaction commits. A show that moved drops the trees of the owners
+#  involved, which reload on their next check.
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_moves(session, flush_context, instances):
+    pending = session.info.setdefault('schedule_changes', [])
+    for obj in session.dirty:
+        if not isinstance(obj, Show) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        for model, (column, window_column) in _owner_fk.items():
+            history = state.attrs[column.key].history
+            for id in set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ()):
+                if id is not None:
+                    pending.append((model, 'reload', id, None))
+
+@event.listens_for(db.session, 'after_flush')
+def _collect(session, flush_context):
+    pending = session.info.setdefault('schedule_changes', [])
+    for change, objs in (('add', session.new), ('discard', session.deleted)):
+        for obj in objs:
+            if isinstance(obj, Show):
+                for model, (column, window_column) in _owner_fk.items():
+                    pending.append((model, change, getattr(obj, column.key), (obj.start_time, obj.end_time, obj.id)))
+
+def _collect_bulk(context):
+    # bulk updates and deletes do not say which rows they touched
+    if context.mapper.class_ is Show:
+        context.session.info['schedule_reset'] = True
+
+event.listen(db.session, 'after_bulk_update', _collect_bulk)
+event.listen(db.session, 'after_bulk_delete', _collect_bulk)
+
+@event.listens_for(db.session, 'after_commit')
+def _apply(session):
+    pending = session.info.pop('schedule_changes', None)
+    if session.info.pop('schedule_reset', False):
+        reset_bookings()
+        return
+    if not pending:
+        return
+    for model, index in _bookings.items():
+        index.apply([(change, id, interval) for owner, change, id, interval in pending if owner is model])
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop('schedule_changes', None)
+    session.info.pop('schedule_reset', None)
+
+def reset_bookings():
+    # for writes that bypass the session, e.g. Core bulk inserts
+    for index in _bookings.values():
+        index.clear()
+
+#  Checks
+#  ----------------------------------------------------------------
+
+def _overlaps(model, owner_id, start, end):
+    # ids of the owner's shows overlapping [start, end)
+    column = _owner_fk[model][0]
+    if db.engine.dialect.name == 'postgresql':
+        rows = _primary(db.select(Show.id)
+            .where(column == owner_id)
+            .where(db.func.tsrange(Show.start_time, Show.end_time).op('&&')(db.func.tsrange(start, end)))
+            .order_by(Show.start_time))
+        return [id for id, in rows]
+    if not current_app.config.get('SCHEDULE_INDEX_MAX_OWNERS', 1024):
+        rows = _primary(db.select(Show.id)
+            .where(column == owner_id, Show.start_time < end, Show.end_time > start)
+            .order_by(Show.start_time, Show.id))
+        return [id for id, in rows]
+    return [key for interval_start, interval_end, key in bookings(model).overlapping(owner_id, start, end)]
+
+def _window(model, owner_id, start, end):
+    # the owner's windows do not overlap, so only the last one opening by
+    # start can contain [start, end). Returns (has windows, fits)
+    column = _owner_fk[model][1]
+    window = _primary(db.select(Availability.end_time)
+        .where(column == owner_id, Availability.start_time <= start)
+        .order_by(Availability.start_time.desc())
+        .limit(1)).first()
+    if window is not None:
+        return True, window.end_time >= end
+    has_windows = _primary(db.select(db.exists().where(column == owner_id))).scalar()
+    return has_windows, False
+
+def _messages(model, has_windows, fits, clashes):
+    name = model.__name__.lower()
+    errors = []
+    if has_windows and not fits:
+        errors.append('The {} is not available at that time.'.format(name))
+    if clashes:
+        errors.append('The {} is already booked at that time (show {}).'.format(
+            name, ', '.join(str(id) for id in clashes)))
+    return errors
+
+def booking_errors(venue_id, artist_id, start, end):
+    """Why a show for ``venue_id`` and ``artist_id`` over [start, end) cannot
+    be booked, as a list of messages; empty when it can."""
+    errors = []
+    for model, owner_id in ((Venue, venue_id), (Artist, artist_id)):
+        has_windows, fits = _window(model, owner_id, start, end)
+        errors += _messages(model, has_windows, fits, _overlaps(model, owner_id, start, end))
+    return errors
+
+def _batch_windows(model, owner_ids, start, end):
+    # (owners with any window, {owner id: [its windows overlapping
+    # [start, end)]}) in two queries
+    column = _owner_fk[model][1]
+    owners = {id for id, in _primary(db.select(column).where(column.in_(owner_ids)).distinct())}
+    windows = defaultdict(list)
+    if owners:
+        rows = _primary(db.select(column, Availability.start_time, Availability.end_time)
+            .where(column.in_(owners), Availability.start_time < end, Availability.end_time > start))
+        for owner_id, window_start, window_end in rows:
+            windows[owner_id].append((window_start, window_end))
+    return owners, windows
+
+def _batch_bookings(model, owner_ids, start, end):
+    # {owner id: tree of its shows overlapping [start, end)} in one query,
+    # straight from the database rather than the per-process trees
+    column = _owner_fk[model][0]
+    trees = defaultdict(IntervalTree)
+    rows = _primary(db.select(column, Show.start_time, Show.end_time, Show.id)
+        .where(column.in_(owner_ids), Show.start_time < end, Show.end_time > start))
+    for owner_id, show_start, show_end, id in rows:
+        trees[owner_id].add(show_start, show_end, id)
+    return trees
+
+def batch_errors(shows):
+    """``booking_errors`` for a batch of new shows, {line number: column
+    values}, which are also checked against each other and for unknown ids.
+    Returns {line number: [messages]} for the shows that cannot be booked.
+
+    The owners' windows and shows over the whole span of the batch are
+    loaded with a fixed number of queries, however long the batch, and the
+    rows are checked against them in memory."""
+    errors = defaultdict(list)
+    if not shows:
+        return {}
+    start = min(values['start_time'] for values in shows.values())
+    end = max(values['end_time'] for values in shows.values())
+    known, windows, booked = {}, {}, {}
+    for model, (column, window_column) in _owner_fk.items():
+        ids = {values[column.key] for values in shows.values()}
+        known[model] = {id for id, in _primary(db.select(model.id).where(model.id.in_(ids), live(model)))}
+        windows[model] = _batch_windows(model, known[model], start, end) if known[model] else (set(), {})
+        booked[model] = _batch_bookings(model, known[model], start, end) if known[model] else {}
+    for line, values in shows.items():
+        for model, (column, window_column) in _owner_fk.items():
+            if values[column.key] not in known[model]:
+                errors[line].append('Unknown {} {}.'.format(model.__name__.lower(), values[column.key]))
+        if errors[line]:
+            continue
+        for model, (column, window_column) in _owner_fk.items():
+            owner_id, show_start, show_end = values[column.key], values['start_time'], values['end_time']
+            owners, owner_windows = windows[model]
+            fits = any(window_start <= show_start and window_end >= show_end
+                       for window_start, window_end in owner_windows.get(owner_id, ()))
+            tree = booked[model].get(owner_id)
+            clashes = [key for _, _, key in tree.overlapping(show_start, show_end)] if tree is not None else []
+            errors[line] += _messages(model, owner_id in owners, fits, clashes)
+    # within the batch: per owner, in start order, each show has to start
+    # after every earlier one has ended
+    for model, (column, window_column) in _owner_fk.items():
+        by_owner = defaultdict(list)
+        for line, values in shows.items():
+            by_owner[values[column.key]].append((values['start_time'], values['end_time'], line))
+        for owner_shows in by_owner.values():
+            owner_shows.sort()
+            latest = None
+            for start, end, line in owner_shows:
+                if latest is not None and start < latest[0]:
+                    errors[line].append('The {} is also booked at that time on line {}.'.format(model.__name__.lower(), latest[1]))
+                if latest is None or end > latest[0]:
+                    latest = (end, line)
+    return {line: messages for line, messages in errors.items() if messages}
+
+def insert_shows(shows):
+    # one multi-row INSERT. Core skips the session events, so the counters
+    # are bumped here and the trees of the owners involved are reloaded once
+    # the transaction commits
+    now = datetime.utcnow()
+    rows = [dict(values, updated_at=now) for values in shows]
+    count_new_shows(rows)
+    db.session.execute(Show.__table__.insert().values(rows))
+    pending = db.session.info.setdefault('schedule_changes', [])
+    for values in shows:
+        for model, (column, window_column) in _owner_fk.items():
+            pending.append((model, 'reload', values[column.key], None))
+
+def forget_shows(rows):
+    """Take show rows (dicts with id, venue_id, artist_id, start_time and
+    end_time) deleted with a Core DELETE out of the booking trees once the
+    transaction commits."""
+    pending = db.session.info.setdefault('schedule_changes', [])
+    for row in rows:
+        for model, (column, window_column) in _owner_fk.items():
+            pending.append((model, 'discard', row[column.key], (row['start_time'], row['end_time'], row['id'])))
+
+def is_booking_conflict(error):
+    # the exclusion constraints caught a booking that raced the check above
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == '23P01'
+
+#  Free slots
+#  ----------------------------------------------------------------
+
+def _windows(model, owner_id, start, end):
+    # the owner's windows clipped to [start, end); all of it if it has none
+    column = _owner_fk[model][1]
+    if not _primary(db.select(db.exists().where(column == owner_id))).scalar():
+        return [(start, end)]
+    rows = _primary(db.select(Availability.start_time, Availability.end_time)
+        .where(column == owner_id, Availability.start_time < end, Availability.end_time > start)
+        .order_by(Availability.start_time))
+    return [(max(window_start, start), min(window_end, end)) for window_start, window_end in rows]
+
+def _busy(model, owner_id, start, end):
+    column = _owner_fk[model][0]
+    if db.engine.dialect.name == 'postgresql':
+        return _primary(db.select(Show.start_time, Show.end_time)
+            .where(column == owner_id)
+            .where(db.func.tsrange(Show.start_time, Show.end_time).op('&&')(db.func.tsrange(start, end)))
+            .order_by(Show.start_time)).all()
+    if not current_app.config.get('SCHEDULE_INDEX_MAX_OWNERS', 1024):
+        return _primary(db.select(Show.start_time, Show.end_time)
+            .where(column == owner_id, Show.start_time < end, Show.end_time > start)
+            .order_by(Show.start_time)).all()
+    return [(interval_start, interval_end) for interval_start, interval_end, key
+            in bookings(model).overlapping(owner_id, start, end)]
+
+def free_slots(venue_id, start, end, duration):
+    """The stretches of [start, end) in which the venue is open and not
+    booked, of at least ``duration`` each, as (start, end) pairs."""
+    busy = _busy(Venue, venue_id, start, end)
+    slots = []
+    for window_start, window_end in _windows(Venue, venue_id, start, end):
+        cursor = window_start
+        for booked_start, booked_end in busy:
+            if booked_end <= cursor or booked_start >= window_end:
+                continue
+            if booked_start - cursor >= duration:
+                slots.append((cursor, booked_start))
+            cursor = max(cursor, booked_end)
+        if window_end - cursor >= duration:
+            slots.append((cursor, window_end))
+    return slots
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@click.command('add-availability')
+@click.argument('kind', type=click.Choice(['venue', 'artist']))
+@click.argument('owner_id', type=int)
+@click.argument('start', type=click.DateTime())
+@click.argument('end', type=click.DateTime())
+@with_appcontext
+def add_availability(kind, owner_id, start, end):
+    """Open a window in which a venue or artist takes bookings."""
+    model = Venue if kind == 'venue' else Artist
+    if end <= start:
+        raise click.BadParameter('must be after START', param_hint='END')
+    if model.query.get(owner_id) is None:
+        raise click.BadParameter('no {} {}'.format(kind, owner_id), param_hint='OWNER_ID')
+    # enforced by a constraint on PostgreSQL only
+    column = _owner_fk[model][1]
+    overlapping = db.session.query(Availability.id) \
+        .filter(column == owner_id, Availability.start_time < end, Availability.end_time > start) \
+        .first()
+    if overlapping is not None:
+        raise click.ClickException('overlaps availability window {}'.format(overlapping.id))
+    db.session.add(Availability(**{column.key: owner_id, 'start_time': start, 'end_time': end}))
+    db.session.commit()
+    click.echo('{} {} is available from {} to {}.'.format(kind.capitalize(), owner_id, start, end))
@@ -0,0 +1,188 @@
+import threading
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import event
+from models import db, Venue, Artist
+from queries import live, with_genre
+
+#----------------------------------------------------------------------------#
+# Name search.
+#
+# On PostgreSQL the ILIKE below is answered by the pg_trgm GIN indexes on
+# Venue.name / Artist.name and ranked with similarity(). Other databases
+# (SQLite in development) have no trigram index, so an in-process n-gram
+# inverted index narrows the candidates before a single id lookup.
+#----------------------------------------------------------------------------#
+
+NGRAM = 3
+
+def ngrams(text, n=NGRAM):
+    text = text.lower()
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def _rank(term, name):
+    # prefix matches first, then the share of the name covered by the term
+    term_grams = ngrams(term)
+    name_grams = ngrams(name)
+    similarity = len(term_grams & name_grams) / len(term_grams | name_grams) if name_grams else 0.0
+    return (not name.startswith(term), -similarity, name)
+
+
+class NgramIndex:
+    def __init__(self, model):
+        self.model = model
+        self.names = {}
+        self.postings = defaultdict(set)
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def _add(self, id, name):
+        self.names[id] = name.lower()
+        for gram in ngrams(name):
+            self.postings[gram].add(id)
+
+    def _remove(self, id):
+        name = self.names.pop(id, None)
+        if name is None:
+            return
+        for gram in ngrams(name):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self.postings[gram]
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return
+            rows = db.session.query(self.model.id, self.model.name).filter(live(self.model)).yield_per(1000)
+            for id, name in rows:
+                self._add(id, name or '')
+            self.loaded = True
+
+    def apply(self, changes):
+        with self.lock:
+            if not self.loaded:
+                return
+            for id, name in changes:
+                self._remove(id)
+                if name is not None:
+                    self._add(id, name)
+
+    def clear(self):
+        with self.lock:
+            self.names.clear()
+            self.postings.clear()
+            self.loaded = False
+
+    def search(self, term):
+        self.load()
+        term = term.lower()
+        with self.lock:
+            if len(term) < NGRAM:
+                candidates = self.names.keys()
+            else:
+                grams = sorted(ngrams(term), key=lambda gram: len(self.postings.get(gram, ())))
+                candidates = set(self.postings.get(grams[0], ()))
+                for gram in grams[1:]:
+                    candidates &= self.postings.get(gram, set())
+                    if not candidates:
+                        break
+            hits = [(id, self.names[id]) for id in candidates if term in self.names[id]]
+        hits.sort(key=lambda hit: _rank(term, hit[1]))
+        return [id for id, name in hits]
+
+
+_indexes = {model: NgramIndex(model) for model in (Venue, Artist)}
+
+#  Index maintenance
+#  ----------------------------------------------------------------
+#  Name changes are collected per flush and applied to the in-process
+#  indexes only once the transaction commits. A deleted venue leaves the
+#  index as soon as it is flagged.
+
+@event.listens_for(db.session, 'after_flush')
+def _collect(session, flush_context):
+    pending = session.info.setdefault('search_changes', [])
+    for obj in session.new | session.dirty:
+        if type(obj) in _indexes:
+            hidden = getattr(obj, 'deleted_at', None) is not None
+            pending.append((type(obj), obj.id, None if hidden else obj.name or ''))
+    for obj in session.deleted:
+        if type(obj) in _indexes:
+            pending.append((type(obj), obj.id, None))
+
+@event.listens_for(db.session, 'after_commit')
+def _apply(session):
+    pending = session.info.pop('search_changes', None)
+    if not pending:
+        return
+    changes = defaultdict(list)
+    for model, id, name in pending:
+        changes[model].append((id, name))
+    for model, model_changes in changes.items():
+        _indexes[model].apply(model_changes)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop('search_changes', None)
+
+def reset_index(model):
+    # for writes that bypass the session, e.g. Core bulk inserts
+    _indexes[model].clear()
+
+#  Queries
+#  ----------------------------------------------------------------
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _upcoming_query(model):
+    return db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+    )
+
+def _search_postgresql(model, term, limit, genre):
+    total = db.func.count().over()
+    rows = with_genre(_upcoming_query(model), model, genre) \
+        .add_columns(total.label('total')) \
+        .filter(model.name.ilike('%' + _escape_like(term) + '%', escape='\\'), live(model)) \
+        .order_by(db.func.similarity(model.name, term).desc(), model.name, model.id) \
+        .limit(limit) \
+        .all()
+    return (rows[0].total if rows else 0), rows
+
+def _search_ngram(model, term, limit, genre):
+    ids = _indexes[model].search(term)
+    if genre:
+        in_genre = {id for id, in with_genre(db.session.query(model.id), model, genre)}
+        ids = [id for id in ids if id in in_genre]
+    page = ids[:limit]
+    if not page:
+        return len(ids), []
+    rows = {row.id: row for row in _upcoming_query(model).filter(model.id.in_(page))}
+    return len(ids), [rows[id] for id in page if id in rows]
+
+def search_names(model, term, limit=None, genre=None):
+    """Case-insensitive partial match on ``model.name``, best matches first,
+    optionally restricted to one genre."""
+    term = term.strip()
+    if limit is None:
+        limit = current_app.config.get('SEARCH_RESULT_LIMIT', 20)
+    if db.engine.dialect.name == 'postgresql':
+        count, rows = _search_postgresql(model, term, limit, genre)
+    else:
+        count, rows = _search_ngram(model, term, limit, genre)
+    return {
+        "count": count,
+        "data": [{
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows,
+        } for row in rows]
+    }
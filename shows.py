@@ -0,0 +1,122 @@
+from flask import Blueprint, render_template, request, Response, flash, abort, current_app, stream_with_context
+from sqlalchemy.exc import SQLAlchemyError
+from forms import ShowForm, ShowBatchForm
+from models import db, Venue, Artist, Show
+from queries import live, show_list
+from pagination import Keyset
+from cache import cache
+from scheduling import booking_errors, batch_errors, insert_shows, is_booking_conflict
+from export import FORMATS as EXPORT_FORMATS, export_shows
+
+#----------------------------------------------------------------------------#
+# Show pages.
+#----------------------------------------------------------------------------#
+
+shows = Blueprint('shows', __name__)
+
+#  Listing and export
+#  ----------------------------------------------------------------
+
+@shows.route('/shows')
+@cache.cached('Show', 'Venue', 'Artist')
+def index():
+    # displays list of shows at /shows
+    page = show_list(Keyset.from_request(current_app.config['PAGE_SIZE']))
+    return render_template('pages/shows.html', shows=page.items, page=page)
+
+@shows.route('/shows/export')
+def export_show_calendar():
+    # streams the full show calendar as csv, ndjson or ics
+    format = request.args.get('format', 'csv')
+    if format not in EXPORT_FORMATS:
+        abort(400)
+    mimetype, filename = EXPORT_FORMATS[format]
+    body = stream_with_context(export_shows(format, host=request.host))
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': 'attachment; filename=' + filename,
+    })
+
+#  Create Show
+#  ----------------------------------------------------------------
+
+@shows.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+@shows.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    form = ShowForm(request.form)
+    if not form.validate():
+        flash('An error occurred. Show could not be listed.')
+        return render_template('forms/new_show.html', form=form)
+    values = form.column_values()
+    venue = Venue.query.filter(Venue.id == values['venue_id'], live(Venue)).first()
+    if Artist.query.get(values['artist_id']) is None or venue is None:
+        flash('An error occurred. Show could not be listed: unknown artist or venue.')
+        return render_template('forms/new_show.html', form=form)
+    errors = booking_errors(values['venue_id'], values['artist_id'], values['start_time'], values['end_time'])
+    if errors:
+        flash('Show could not be listed. ' + ' '.join(errors))
+        return render_template('forms/new_show.html', form=form)
+    try:
+        db.session.add(Show(**values))
+        db.session.commit()
+        flash('Show was successfully listed!')
+    except SQLAlchemyError as error:
+        db.session.rollback()
+        if is_booking_conflict(error):
+            flash('Show could not be listed. The venue or the artist was booked at that time in the meantime.')
+            return render_template('forms/new_show.html', form=form)
+        current_app.logger.exception('could not create show')
+        flash('An error occurred. Show could not be listed.')
+    return render_template('pages/home.html')
+
+@shows.route('/shows/create-batch')
+def create_show_batch():
+    form = ShowBatchForm()
+    return render_template('forms/new_shows.html', form=form, row_errors={})
+
+@shows.route('/shows/create-batch', methods=['POST'])
+def create_show_batch_submission():
+    # every row is validated first; then all of them go in with one INSERT
+    # and one commit, or none do
+    form = ShowBatchForm(request.form)
+    if not form.validate():
+        flash('An error occurred. Shows could not be listed.')
+        return render_template('forms/new_shows.html', form=form, row_errors={})
+    # an oversized batch is turned away before any row is validated
+    total, limit = form.count(), current_app.config['SHOW_BATCH_MAX_ROWS']
+    if total > limit:
+        flash('Shows could not be listed: at most {} rows can be listed at once.'.format(limit))
+        return render_template('forms/new_shows.html', form=form, row_errors={})
+    rows, row_errors = {}, {}
+    for line, values, errors in form.shows():
+        if errors:
+            row_errors[line] = errors
+        else:
+            rows[line] = values
+    for line, errors in batch_errors(rows).items():
+        row_errors.setdefault(line, []).extend(errors)
+    if row_errors or not rows:
+        flash('Shows could not be listed: {} of {} rows have errors.'.format(len(row_errors), total))
+        return render_template('forms/new_shows.html', form=form, row_errors=dict(sorted(row_errors.items())))
+    try:
+        insert_shows(list(rows.values()))
+        db.session.commit()
+        # a Core insert, so the response cache is not told by the session
+        tags = {'Show'}
+        for values in rows.values():
+            tags.update(('Venue:{}'.format(values['venue_id']), 'Artist:{}'.format(values['artist_id'])))
+        cache.invalidate(tags)
+        flash('{} show{} successfully listed!'.format(len(rows), ' was' if len(rows) == 1 else 's were'))
+    except SQLAlchemyError as error:
+        db.session.rollback()
+        if is_booking_conflict(error):
+            flash('Shows could not be listed. A venue or an artist was booked at one of those times in the meantime.')
+            return render_template('forms/new_shows.html', form=form, row_errors={})
+        current_app.logger.exception('could not create shows')
+        flash('An error occurred. Shows could not be listed.')
+    return render_template('pages/home.html')
@@ -0,0 +1,130 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+import click
+from flask.cli import with_appcontext
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from cache import LocalBackend, NullBackend
+from pagination import page_url
+
+#----------------------------------------------------------------------------#
+# Template filters, compilation and fragment caching.
+#
+# Compiled templates are kept in a filesystem bytecode cache shared by every
+# worker, and are all loaded at startup so the first request to each page
+# does not pay for parsing. Expensive blocks can be wrapped in
+#
+#   {% cache 'venue-show', show.id, show.updated_at %} ... {% endcache %}
+#
+# which keeps the rendered markup in a per-process LRU under the given key.
+# Keys name the versions of the entities the block shows, so an edit
+# produces a new key rather than needing an invalidation, and per-process
+# copies can never disagree.
+#----------------------------------------------------------------------------#
+
+#  Filters
+#  ----------------------------------------------------------------
+#  babel and dateutil are imported on the first date rendered rather than
+#  when a worker starts.
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+# babel's own named formats; those not overridden above come from the locale
+NAMED_FORMATS = ('short', 'medium', 'long', 'full')
+
+@lru_cache(maxsize=None)
+def _datetime_pattern(format):
+    # one compiled pattern per format; patterns are locale independent
+    import babel.dates
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+@lru_cache(maxsize=None)
+def _locale(name):
+    import babel
+    return babel.Locale.parse(name)
+
+def _parse_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        # ISO-8601 is what the controllers hand over; avoid dateutil's heuristics
+        return datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except (TypeError, ValueError):
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+
+@lru_cache(maxsize=4096)
+def format_datetime(value, format='medium', locale='en'):
+    date = _parse_datetime(value)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    if format in NAMED_FORMATS and format not in DATETIME_FORMATS:
+        import babel.dates
+        return babel.dates.format_datetime(date, format, tzinfo=date.tzinfo, locale=_locale(locale))
+    return _datetime_pattern(format).apply(date, _locale(locale))
+
+#  Fragment cache
+#  ----------------------------------------------------------------
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=NullBackend(), fragment_cache_timeout=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(key)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        key = 'fragment:' + '\x1f'.join(str(part) for part in key)
+        backend = self.environment.fragment_cache
+        fragment = backend.get(key)
+        if fragment is None:
+            fragment = caller()
+            backend.set(key, fragment, self.environment.fragment_cache_timeout)
+        return Markup(fragment)
+
+
+#  Setup
+#  ----------------------------------------------------------------
+
+def precompile(app):
+    # load every template once; each lands in the environment's template
+    # cache and, when it was not there already, in the bytecode cache
+    env = app.jinja_env
+    names = env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        env.get_template(name)
+    return names
+
+def init_app(app):
+    env = app.jinja_env
+    env.filters['datetime'] = format_datetime
+    env.globals['page_url'] = page_url
+    env.bytecode_cache = FileSystemBytecodeCache(app.config.get('TEMPLATE_BYTECODE_CACHE_DIR'))
+    env.add_extension(FragmentCacheExtension)
+    max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 4096)
+    env.fragment_cache = LocalBackend(max_entries) if max_entries else NullBackend()
+    env.fragment_cache_timeout = app.config.get('FRAGMENT_CACHE_TIMEOUT', 3600)
+    if app.config.get('TEMPLATE_PRECOMPILE', False):
+        precompile(app)
+
+
+@click.command('compile-templates')
+@with_appcontext
+def compile_templates():
+    """Compile every template into the bytecode cache."""
+    names = precompile(current_app)
+    click.echo('Compiled {} templates.'.format(len(names)))
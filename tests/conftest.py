@@ -0,0 +1,81 @@
+import os
+import sys
+from datetime import datetime, timedelta
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from models import db, Venue, Artist, Show
+from scheduling import reset_bookings
+
+#----------------------------------------------------------------------------#
+# Every test gets an app on a fresh SQLite file of its own, created with
+# create_all(), and runs inside its app context.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def config(tmp_path):
+    (tmp_path / 'jinja').mkdir()
+    return {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+        'SQLALCHEMY_REPLICA_URIS': [],
+        'WTF_CSRF_ENABLED': False,
+        'CACHE_TYPE': 'local',
+        'INSTRUMENTATION_ENABLED': False,
+        'TEMPLATE_PRECOMPILE': False,
+        'TEMPLATE_BYTECODE_CACHE_DIR': str(tmp_path / 'jinja'),
+        'IMAGE_CACHE_DIR': str(tmp_path / 'images'),
+    }
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+    # the booking trees are per process and keyed by id
+    reset_bookings()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+#  Rows
+#  ----------------------------------------------------------------
+
+@pytest.fixture
+def make_venue(app):
+    def make_venue(**values):
+        venue = Venue(**dict({'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+                              'address': '1015 Folsom Street'}, **values))
+        db.session.add(venue)
+        db.session.commit()
+        return venue
+    return make_venue
+
+@pytest.fixture
+def make_artist(app):
+    def make_artist(**values):
+        artist = Artist(**dict({'name': 'Guns N Petals', 'city': 'San Francisco', 'state': 'CA'}, **values))
+        db.session.add(artist)
+        db.session.commit()
+        return artist
+    return make_artist
+
+@pytest.fixture
+def make_show(app):
+    def make_show(venue, artist, start_time, hours=2):
+        show = Show(venue_id=venue.id, artist_id=artist.id, start_time=start_time,
+                    end_time=start_time + timedelta(hours=hours))
+        db.session.add(show)
+        db.session.commit()
+        return show
+    return make_show
+
+@pytest.fixture
+def soon():
+    # a whole hour in the future, in the UTC time base of the stored shows
+    return datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+def _slots(client, venue, **args):
+    response = client.get('/api/v1/venues/{}/free-slots'.format(venue.id), query_string=args)
+    assert response.status_code == 200, response.data
+    return response.get_json()
+
+def test_free_slots_default_to_the_next_week_in_utc(client, make_venue):
+    venue = make_venue()
+    data = _slots(client, venue)
+    start = datetime.fromisoformat(data['start'])
+    assert abs(start - datetime.utcnow()) < timedelta(minutes=2)
+    assert datetime.fromisoformat(data['end']) - start == timedelta(days=7)
+
+def test_free_slots_convert_offsets_to_utc(client, make_venue, make_artist, make_show):
+    venue = make_venue()
+    make_show(venue, make_artist(), datetime(2035, 4, 1, 18))
+    data = _slots(client, venue, start='2035-04-01T19:00:00+02:00', end='2035-04-02T02:00:00+02:00')
+    assert (data['start'], data['end']) == ('2035-04-01T17:00:00', '2035-04-02T00:00:00')
+    assert data['data'] == [{'start': '2035-04-01T20:00:00', 'end': '2035-04-02T00:00:00'}]
+
+def test_free_slots_reject_bad_arguments(client, make_venue):
+    venue = make_venue()
+    path = '/api/v1/venues/{}/free-slots'.format(venue.id)
+    assert client.get(path, query_string={'start': 'tomorrow'}).status_code == 400
+    assert client.get(path, query_string={'start': '2035-04-02', 'end': '2035-04-01'}).status_code == 400
+    assert client.get('/api/v1/venues/{}/free-slots'.format(venue.id + 1)).status_code == 404
+
+def test_unknown_paths_and_methods_get_json_errors(client):
+    response = client.get('/api/v1/nope')
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Not Found', 'status': 404}
+    response = client.post('/api/v1/venues')
+    assert response.status_code == 405
+    assert response.get_json() == {'error': 'Method Not Allowed', 'status': 405}
+    # the pages keep their HTML errors
+    assert client.get('/nope').mimetype == 'text/html'
+    assert client.post('/').mimetype == 'text/html'
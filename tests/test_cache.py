@@ -0,0 +1,60 @@
+import pytest
+from models import db, Artist
+from cache import cache
+
+# the in-process LRU, and the shared backend over LocalRedis, the redis
+# stand-in
+@pytest.fixture(params=['local', 'shared-local'])
+def config(request, config):
+    config['CACHE_TYPE'] = request.param
+    return config
+
+def _misses(client, *paths):
+    before = cache.stats['misses']
+    for path in paths:
+        assert client.get(path).status_code == 200
+    return cache.stats['misses'] - before
+
+def test_detail_pages_are_cached(client, make_venue):
+    venue = make_venue()
+    path = '/venues/{}'.format(venue.id)
+    assert _misses(client, path) == 1
+    assert _misses(client, path) == 0
+
+def test_row_write_only_invalidates_its_own_pages(client, make_venue, make_artist):
+    venues = [make_venue(name='Venue {}'.format(i)) for i in range(3)]
+    artist = make_artist()
+    pages = ['/venues/{}'.format(venue.id) for venue in venues] + ['/artists/{}'.format(artist.id)]
+    assert _misses(client, *pages) == 4
+
+    make_artist(name='Someone Else')
+    assert _misses(client, *pages) == 0
+
+    venues[0].name = 'Renamed'
+    db.session.commit()
+    assert _misses(client, *pages) == 1
+    assert b'Renamed' in client.get(pages[0]).data
+
+def test_listing_follows_row_writes(client, make_venue):
+    make_venue(name='First')
+    assert _misses(client, '/venues') == 1
+    make_venue(name='Second')
+    response = client.get('/venues')
+    assert b'Second' in response.data
+
+def test_bulk_write_invalidates_every_detail_page(client, make_artist):
+    artists = [make_artist(name='Artist {}'.format(i)) for i in range(2)]
+    pages = ['/artists/{}'.format(artist.id) for artist in artists]
+    _misses(client, *pages)
+    Artist.query.filter(Artist.id == artists[0].id).update({'name': 'Bulk'}, synchronize_session=False)
+    db.session.commit()
+    assert _misses(client, *pages) == 2
+
+def test_moving_a_show_invalidates_both_venues(client, make_venue, make_artist, make_show, soon):
+    first, second = make_venue(name='First'), make_venue(name='Second')
+    show = make_show(first, make_artist(), soon)
+    pages = ['/venues/{}'.format(first.id), '/venues/{}'.format(second.id)]
+    _misses(client, *pages)
+    show.venue_id = second.id
+    db.session.commit()
+    assert _misses(client, *pages) == 2
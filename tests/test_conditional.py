@@ -0,0 +1,49 @@
+from datetime import timedelta
+from models import db, Show
+from cache import cache
+from counters import roll
+
+def _start(show_id, start_time):
+    # move a show's start as the clock would: no row version, no cache tags
+    show = Show.__table__
+    db.session.execute(show.update().where(show.c.id == show_id).values(start_time=start_time, updated_at=show.c.updated_at))
+    db.session.commit()
+
+def test_unchanged_page_answers_304(client, make_venue, make_artist, make_show, soon):
+    venue = make_venue()
+    make_show(venue, make_artist(), soon)
+    path = '/venues/{}'.format(venue.id)
+    first = client.get(path)
+    assert first.status_code == 200 and first.headers['ETag']
+
+    again = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert not again.data
+
+def test_started_show_is_not_served_from_the_old_entry(client, make_venue, make_artist, make_show, soon):
+    venue = make_venue()
+    show_id = make_show(venue, make_artist(), soon).id
+    path = '/venues/{}'.format(venue.id)
+    before = client.get(path)
+    assert b'1 Upcoming Show' in before.data
+
+    _start(show_id, soon - timedelta(days=2))
+    after = client.get(path, headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert b'1 Past Show' in after.data
+    assert client.get(path, headers={'If-None-Match': after.headers['ETag']}).status_code == 304
+
+def test_roll_invalidates_the_owners_pages(app, make_venue, make_artist, make_show, soon):
+    venue, artist = make_venue(), make_artist()
+    other = make_venue(name='Other')
+    show_id = make_show(venue, artist, soon).id
+    tags = ['Venue:{}'.format(venue.id), 'Artist:{}'.format(artist.id), 'Venue:{}'.format(other.id)]
+    before = cache.backend.get_versions(tags)
+
+    _start(show_id, soon - timedelta(days=2))
+    assert roll() == 1
+    after = cache.backend.get_versions(tags)
+    assert after[0] != before[0] and after[1] != before[1]
+    assert after[2] == before[2]
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql
+from models import db, utcnow, Venue, Artist, Show
+from counters import database_now, roll, recount
+
+def _counts(*rows):
+    db.session.expire_all()
+    return [row.upcoming_shows_count for row in rows]
+
+def test_session_writes_move_the_counters(make_venue, make_artist, make_show, soon):
+    venue, artist = make_venue(), make_artist()
+    upcoming = make_show(venue, artist, soon)
+    make_show(venue, artist, soon - timedelta(days=30))
+    assert upcoming.upcoming
+    assert _counts(venue, artist) == [1, 1]
+
+    other = make_venue(name='Other')
+    upcoming.venue_id = other.id
+    db.session.commit()
+    assert _counts(venue, other, artist) == [0, 1, 1]
+
+    upcoming.start_time = soon - timedelta(days=2)
+    upcoming.end_time = upcoming.start_time + timedelta(hours=2)
+    db.session.commit()
+    assert _counts(other, artist) == [0, 0]
+
+    upcoming.start_time = soon
+    upcoming.end_time = soon + timedelta(hours=2)
+    db.session.commit()
+    db.session.delete(upcoming)
+    db.session.commit()
+    assert _counts(other, artist) == [0, 0]
+
+def test_roll_shows_moves_started_shows_off_the_counters(app, make_venue, make_artist, make_show, soon):
+    venue, artist = make_venue(), make_artist()
+    first = make_show(venue, artist, soon)
+    make_show(venue, artist, soon + timedelta(days=1))
+    make_show(venue, artist, soon + timedelta(days=2))
+    assert _counts(venue, artist) == [3, 3]
+
+    assert roll(now=database_now()) == 0
+    assert roll(now=soon + timedelta(days=1), batch_size=1) == 2
+    assert _counts(venue, artist) == [1, 1]
+    assert not Show.query.get(first.id).upcoming
+
+    # the command on the real clock finds nothing more to roll
+    result = app.test_cli_runner().invoke(args=['roll-shows'])
+    assert result.output == 'Rolled 0 shows from upcoming to past.\n'
+
+def test_recount_rebuilds_the_counters(app, make_venue, make_artist, make_show, soon):
+    venue, artist = make_venue(), make_artist()
+    make_show(venue, artist, soon)
+    Venue.query.update({'upcoming_shows_count': 7}, synchronize_session=False)
+    Artist.query.update({'upcoming_shows_count': 0}, synchronize_session=False)
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['roll-shows', '--recount'])
+    assert result.output == 'Recounted upcoming shows.\n'
+    assert _counts(venue, artist) == [1, 1]
+    recount(now=soon + timedelta(hours=1))
+    assert _counts(venue, artist) == [0, 0]
+
+def test_database_now_is_naive_utc(app):
+    now = database_now()
+    assert now.tzinfo is None
+    assert abs(now - datetime.utcnow()) < timedelta(minutes=1)
+    # now() on PostgreSQL follows the session's TimeZone
+    assert str(db.select(utcnow()).compile(dialect=postgresql.dialect())) == "SELECT timezone('utc', now()) AS anon_1"
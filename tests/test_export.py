@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+START = datetime(2035, 4, 1, 20)
+
+def _export(client, format):
+    response = client.get('/shows/export?format={}'.format(format))
+    assert response.status_code == 200
+    return response
+
+def _show(make_venue, make_artist, make_show):
+    venue, artist = make_venue(name='The Musical Hop'), make_artist(name='Guns N Petals')
+    return make_show(venue, artist, START, hours=3).id, venue.id, artist.id
+
+def test_csv(client, make_venue, make_artist, make_show):
+    show_id, venue_id, artist_id = _show(make_venue, make_artist, make_show)
+    response = _export(client, 'csv')
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=shows.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 1
+    assert rows[0]['id'] == str(show_id)
+    assert rows[0]['start_time'] == '2035-04-01T20:00:00'
+    assert (rows[0]['venue_name'], rows[0]['artist_name']) == ('The Musical Hop', 'Guns N Petals')
+
+def test_ndjson(client, make_venue, make_artist, make_show):
+    show_id, venue_id, artist_id = _show(make_venue, make_artist, make_show)
+    response = _export(client, 'ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert records == [{
+        'id': show_id, 'start_time': '2035-04-01T20:00:00',
+        'venue_id': venue_id, 'venue_name': 'The Musical Hop',
+        'artist_id': artist_id, 'artist_name': 'Guns N Petals', 'artist_image_link': None,
+    }]
+
+def test_ics(client, make_venue, make_artist, make_show):
+    show_id, venue_id, artist_id = _show(make_venue, make_artist, make_show)
+    response = _export(client, 'ics')
+    assert response.mimetype == 'text/calendar'
+    lines = response.get_data(as_text=True).split('\r\n')
+    assert lines[0] == 'BEGIN:VCALENDAR' and lines[-2:] == ['END:VCALENDAR', '']
+    assert 'UID:show-{}@localhost'.format(show_id) in lines
+    # times are UTC, and the event ends with the show
+    assert 'DTSTART:20350401T200000Z' in lines
+    assert 'DTEND:20350401T230000Z' in lines
+    assert 'SUMMARY:Guns N Petals at The Musical Hop' in lines
+
+def test_unknown_format_is_rejected(client):
+    assert client.get('/shows/export?format=xml').status_code == 400
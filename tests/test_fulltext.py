@@ -0,0 +1,41 @@
+from models import db, Genre
+
+# on SQLite the FTS5 search_index, ranked by bm25
+
+def _search(client, term):
+    response = client.get('/api/v1/search', query_string={'q': term})
+    assert response.status_code == 200
+    return response.get_json()
+
+def _names(result):
+    return [(hit['type'], hit['name']) for hit in result['data']]
+
+def test_results_are_ranked_name_genres_place_description(client, make_venue, make_artist):
+    make_artist(name='Night Owls', seeking_venue=True, seeking_description='Any stage that books jazz')
+    make_venue(name='Blue Room', city='Jazz Springs', state='CO')
+    make_artist(name='Quartet', genres=Genre.by_names(['Jazz']))
+    make_venue(name='The Jazz Cellar')
+    make_artist(name='Unrelated Band')
+
+    result = _search(client, 'jazz')
+    assert result['count'] == 4
+    assert _names(result) == [
+        ('venue', 'The Jazz Cellar'), ('artist', 'Quartet'), ('venue', 'Blue Room'), ('artist', 'Night Owls')]
+
+def test_every_word_must_match(client, make_venue):
+    make_venue(name='The Jazz Cellar', city='Oakland')
+    make_venue(name='Jazz Corner', city='San Francisco')
+    assert _names(_search(client, 'jazz oakland')) == [('venue', 'The Jazz Cellar')]
+    assert _search(client, '"*')['count'] == 0
+
+def test_edits_reach_the_results(client, make_venue):
+    venue = make_venue(name='The Musical Hop')
+    assert _search(client, 'hop')['count'] == 1
+    assert b'The Musical Hop' in client.get('/search?q=hop').data
+
+    venue.name = 'Park Theater'
+    db.session.commit()
+    assert _search(client, 'hop')['count'] == 0
+    assert _names(_search(client, 'park')) == [('venue', 'Park Theater')]
+    assert b'Park Theater' in client.get('/search?q=park').data
+    assert b'The Musical Hop' not in client.get('/search?q=hop').data
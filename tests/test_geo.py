@@ -0,0 +1,46 @@
+import pytest
+
+# on SQLite the box is narrowed by the venue_location R*Tree
+
+@pytest.fixture
+def places(make_venue):
+    return {
+        name: make_venue(name=name, city=city, state=state, latitude=lat, longitude=lng).id
+        for name, city, state, lat, lng in [
+            ('The Musical Hop', 'San Francisco', 'CA', 37.7749, -122.4194),
+            ('Fox Theater', 'Oakland', 'CA', 37.8044, -122.2712),
+            ('The Wiltern', 'Los Angeles', 'CA', 34.0522, -118.2437),
+        ]
+    }
+
+def _nearby(client, query):
+    response = client.get('/api/v1/venues/nearby?' + query)
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_radius_finds_the_venues_within_it_nearest_first(client, places):
+    result = _nearby(client, 'lat=37.7749&lng=-122.4194&radius=25')
+    assert [venue['name'] for venue in result['data']] == ['The Musical Hop', 'Fox Theater']
+    assert result['count'] == 2
+    assert result['data'][0]['distance'] == 0
+    assert 8 < result['data'][1]['distance'] < 9
+
+    result = _nearby(client, 'lat=37.7749&lng=-122.4194&radius=400')
+    assert [venue['name'] for venue in result['data']] == ['The Musical Hop', 'Fox Theater', 'The Wiltern']
+
+def test_bbox_lists_the_venues_inside_it_by_name(client, places):
+    result = _nearby(client, 'bbox=-123,37,-122,38.5')
+    assert [venue['name'] for venue in result['data']] == ['Fox Theater', 'The Musical Hop']
+    assert all(venue['distance'] is None for venue in result['data'])
+    assert _nearby(client, 'bbox=-119,33,-118,35')['data'][0]['id'] == places['The Wiltern']
+
+@pytest.mark.parametrize('query', [
+    'lat=37.7749&lng=-122.4194&radius=501',
+    'lat=37.7749&lng=-122.4194&radius=0',
+    'lat=91&lng=-122.4194',
+    'lat=37.7749',
+    'bbox=-122,38,-123,37',
+])
+def test_bad_arguments_are_rejected(client, places, query):
+    assert client.get('/api/v1/venues/nearby?' + query).status_code == 400
+    assert client.get('/venues/nearby?' + query).status_code == 400
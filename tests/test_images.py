@@ -0,0 +1,121 @@
+import io
+import os
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+from PIL import Image
+from images import DiskCache, image_url
+
+#  Stand-in for the image origin
+#  ----------------------------------------------------------------
+
+def _png(width, height):
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 40, 40)).save(out, 'PNG')
+    return out.getvalue()
+
+class Origin(BaseHTTPRequestHandler):
+    images = {}
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        body = self.images.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def origin():
+    server = HTTPServer(('127.0.0.1', 0), Origin)
+    Origin.images = {'/big.png': _png(1600, 1200)}
+    Origin.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:{}'.format(server.server_port)
+    server.shutdown()
+
+@pytest.fixture
+def config(config):
+    config['IMAGE_PROXY_ALLOW_PRIVATE'] = True
+    return config
+
+#  Proxy
+#  ----------------------------------------------------------------
+
+def test_scaled_copy_is_served_and_cached(app, client, make_artist, origin):
+    link = origin + '/big.png'
+    artist = make_artist(image_link=link)
+    with app.test_request_context():
+        url = image_url('artist', artist.id, link, 'sm')
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.cache_control.immutable and response.cache_control.max_age == 365 * 24 * 3600
+    assert Image.open(io.BytesIO(response.data)).size == (200, 150)
+    assert client.get(url).data == response.data
+    assert Origin.requests == ['/big.png']
+
+def test_outdated_version_is_cached_briefly(client, make_artist, origin):
+    artist = make_artist(image_link=origin + '/big.png')
+    response = client.get('/img/artist/{}/md?v=00000000'.format(artist.id))
+    assert response.status_code == 200
+    assert not response.cache_control.immutable and response.cache_control.max_age == 3600
+
+def test_private_address_is_refused(app, client, make_artist, origin):
+    app.config['IMAGE_PROXY_ALLOW_PRIVATE'] = False
+    artist = make_artist(image_link=origin + '/big.png')
+    response = client.get('/img/artist/{}/md'.format(artist.id))
+    assert response.status_code == 302 and response.location == origin + '/big.png'
+    assert Origin.requests == []
+
+def test_unreadable_source_redirects(client, make_artist, origin):
+    artist = make_artist(image_link=origin + '/missing.png')
+    response = client.get('/img/artist/{}/md'.format(artist.id))
+    assert response.status_code == 302
+
+def test_evicted_copy_is_fetched_again(app, client, make_venue, origin):
+    venue = make_venue(image_link=origin + '/big.png')
+    path = '/img/venue/{}/lg'.format(venue.id)
+    assert client.get(path).status_code == 200
+    for directory, _, names in os.walk(os.path.join(app.config['IMAGE_CACHE_DIR'], 'blobs')):
+        for name in names:
+            os.remove(os.path.join(directory, name))
+    assert client.get(path).status_code == 200
+    assert len(Origin.requests) == 2
+
+def test_deleted_venue_has_no_image(client, make_venue, origin):
+    from datetime import datetime
+    venue = make_venue(image_link=origin + '/big.png', deleted_at=datetime.utcnow())
+    assert client.get('/img/venue/{}/md'.format(venue.id)).status_code == 404
+
+#  Disk cache
+#  ----------------------------------------------------------------
+
+def test_disk_cache_keeps_to_its_size(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    for i in range(10):
+        cache.put('key{}'.format(i), bytes([i]) * 300, 'image/png')[0].close()
+        assert cache.size <= 1000
+    assert sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(str(tmp_path / 'blobs')) for name in names) == cache.size
+    assert cache.get('key0') is None
+    body, mimetype, digest = cache.get('key9')
+    with body:
+        assert body.read() == bytes([9]) * 300 and mimetype == 'image/png'
+
+def test_disk_cache_only_walks_when_full(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=10000)
+    walks = []
+    walk = cache._walk
+    monkeypatch.setattr(cache, '_walk', lambda: walks.append(1) or walk())
+    for i in range(5):
+        cache.put('key{}'.format(i), bytes([i]) * 100, 'image/png')
+    assert len(walks) == 1
@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+from models import Artist, Show
+
+def _import(app, tmp_path, kind, rows):
+    path = tmp_path / '{}.jsonl'.format(kind)
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    rejects = tmp_path / 'rejects.jsonl'
+    result = app.test_cli_runner().invoke(args=['import-data', kind, str(path), '--rejects', str(rejects)])
+    assert result.exit_code == 0, result.output
+    # the rejects file is only opened for the first reject
+    if not rejects.exists():
+        return []
+    return [json.loads(line) for line in rejects.read_text().splitlines()]
+
+def test_show_start_times_are_stored_as_utc(app, tmp_path, make_venue, make_artist):
+    venue, artist = make_venue(), make_artist()
+    rows = [
+        {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-04-01T20:00:00+02:00'},
+        {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-04-02T20:00:00Z'},
+        {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-04-03 20:00:00'},
+    ]
+    assert _import(app, tmp_path, 'shows', rows) == []
+    assert [show.start_time for show in Show.query.order_by(Show.start_time)] == [
+        datetime(2035, 4, 1, 18), datetime(2035, 4, 2, 20), datetime(2035, 4, 3, 20)]
+
+def test_show_without_start_time_is_rejected(app, tmp_path, make_venue, make_artist):
+    venue, artist = make_venue(), make_artist()
+    rejects = _import(app, tmp_path, 'shows', [
+        {'venue_id': venue.id, 'artist_id': artist.id},
+        {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': ''},
+    ])
+    assert [reject['line'] for reject in rejects] == [1, 2]
+    assert all('start_time' in reject['errors'] for reject in rejects)
+    assert Show.query.count() == 0
+
+def test_lines_that_are_not_json_objects_are_rejected(app, tmp_path):
+    row = {'city': 'Austin', 'state': 'TX', 'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/artist'}
+    path = tmp_path / 'artists.jsonl'
+    path.write_text(json.dumps(dict(row, name='First')) + '\n'
+                    + '{"name": "Broken", \n'
+                    + '[1, 2]\n'
+                    + json.dumps(dict(row, name='Last')) + '\n')
+    rejects = tmp_path / 'rejects.jsonl'
+    result = app.test_cli_runner().invoke(args=['import-data', 'artists', str(path), '--rejects', str(rejects)])
+    assert result.exit_code == 0, result.output
+    rejects = [json.loads(line) for line in rejects.read_text().splitlines()]
+    assert [(reject['line'], reject['errors']) for reject in rejects] == [
+        (2, {'json': ['not a JSON object']}), (3, {'json': ['not a JSON object']})]
+    assert sorted(artist.name for artist in Artist.query) == ['First', 'Last']
@@ -0,0 +1,36 @@
+import pytest
+from pagination import encode_cursor, decode_cursor
+
+def test_cursor_round_trip(soon):
+    assert decode_cursor(encode_cursor([soon, 7])) == [soon, 7]
+    assert decode_cursor(encode_cursor(['CA', 'San Francisco', 'Hop', 3])) == ['CA', 'San Francisco', 'Hop', 3]
+
+@pytest.mark.parametrize('cursor', ['%%%', 'bm90IGpzb24', encode_cursor([]).replace('W10', 'e30')])
+def test_garbage_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_pages_walk_both_ways(client, make_artist):
+    names = ['Artist {:02}'.format(i) for i in range(7)]
+    for name in names:
+        make_artist(name=name)
+    client.application.config['PAGE_SIZE'] = 3
+    seen, response = [], client.get('/api/v1/artists').get_json()
+    while True:
+        seen += [artist['name'] for artist in response['data']]
+        if not response['next']:
+            break
+        response = client.get(response['next']).get_json()
+    assert seen == names
+    previous = client.get(response['prev']).get_json()
+    assert [artist['name'] for artist in previous['data']] == names[3:6]
+
+@pytest.mark.parametrize('path', ['/venues', '/artists', '/shows', '/api/v1/venues', '/api/v1/artists', '/api/v1/shows'])
+@pytest.mark.parametrize('values', [['a'], [1, 2, 3, 4, 5], ['x', 'y', 'z', 'w'], [True, 1]])
+def test_cursor_of_the_wrong_shape_is_rejected(client, path, values):
+    for name in ('after', 'before'):
+        assert client.get(path, query_string={name: encode_cursor(values)}).status_code == 400
+
+@pytest.mark.parametrize('path', ['/venues', '/api/v1/artists'])
+def test_garbage_cursor_is_a_bad_request(client, path):
+    assert client.get(path + '?after=%%%').status_code == 400
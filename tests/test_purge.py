@@ -0,0 +1,60 @@
+import time
+from datetime import datetime, timedelta
+import purge
+from models import db, Venue, Artist, Show
+from counters import recount
+
+def _counts():
+    return sorted((model.__name__, row.id, row.upcoming_shows_count)
+                  for model in (Venue, Artist) for row in model.query)
+
+def _wait(venue_id):
+    deadline = time.monotonic() + 10
+    while venue_id in purge._running and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_delete_hides_the_venue_and_purges_its_shows(app, client, make_venue, make_artist, make_show, soon):
+    app.config.update(VENUE_PURGE_BATCH_SIZE=2, VENUE_PURGE_PAUSE=0)
+    venue, other, artist = make_venue(), make_venue(name='Other'), make_artist()
+    for day in range(5):
+        make_show(venue, artist, soon + timedelta(days=day))
+    kept = make_show(other, artist, soon + timedelta(days=10))
+    venue_id, kept_id = venue.id, kept.id
+
+    response = client.delete('/venues/{}'.format(venue_id))
+    assert response.status_code == 202 and response.get_json() == {'id': venue_id, 'deleted': True}
+    assert client.get('/venues/{}'.format(venue_id)).status_code == 404
+    assert client.delete('/venues/{}'.format(venue_id)).status_code == 404
+    _wait(venue_id)
+
+    db.session.expire_all()
+    assert Venue.query.get(venue_id) is None
+    assert [show.id for show in Show.query] == [kept_id]
+    counts = _counts()
+    recount()
+    assert _counts() == counts
+    assert ('Artist', artist.id, 1) in counts
+
+def test_venue_with_locked_shows_is_left_for_later(make_venue, make_artist, make_show, soon, monkeypatch):
+    venue = make_venue(deleted_at=datetime.utcnow())
+    make_show(venue, make_artist(), soon)
+    venue_id = venue.id
+    # every remaining row skipped as locked by another purge
+    monkeypatch.setattr(purge, '_delete_batch', lambda venue_id, batch_size: 0)
+    assert purge.purge_deleted_venues() == (0, 0, 1)
+    assert Venue.query.get(venue_id) is not None
+    monkeypatch.undo()
+    assert purge.purge_deleted_venues() == (1, 1, 0)
+    assert Venue.query.get(venue_id) is None
+
+def test_purge_venues_command(app, make_venue, make_artist, make_show, soon):
+    venue = make_venue(deleted_at=datetime.utcnow())
+    make_show(venue, make_artist(), soon)
+    result = app.test_cli_runner().invoke(args=['purge-venues', '--batch-size', '1'])
+    assert result.output == 'Deleted 1 venues and 1 shows.\n'
+    assert Show.query.count() == 0
+
+def test_delete_button_quotes_the_name(client, make_venue):
+    venue = make_venue(name="Jo's \"Place\" </script>")
+    page = client.get('/venues/{}'.format(venue.id)).get_data(as_text=True)
+    assert "confirm('Delete ' + \"Jo\\u0027s \\\"Place\\\" \\u003c/script\\u003e\" + ' and" in page
@@ -0,0 +1,75 @@
+import sqlite3
+from datetime import datetime
+import pytest
+from models import db, Venue, Availability
+
+#----------------------------------------------------------------------------#
+# The two-file SQLite setup from routing.py: fyyur.db is the primary and
+# replica.db a copy made by `flask sync-replicas`, which then falls behind.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def config(config, tmp_path):
+    config['SQLALCHEMY_REPLICA_URIS'] = ['sqlite:///' + str(tmp_path / 'replica.db')]
+    # every response straight from the database it was read from
+    config['CACHE_TYPE'] = 'null'
+    return config
+
+@pytest.fixture
+def venue(app, make_venue):
+    venue = make_venue(name='Original')
+    result = app.test_cli_runner().invoke(args=['sync-replicas'])
+    assert result.exit_code == 0, result.output
+    # the primary moves on; the replica still has the original name
+    venue.name = 'Primary'
+    db.session.commit()
+    venue_id = venue.id
+    # requests get a session of their own, not one holding the primary's row
+    db.session.remove()
+    return venue_id
+
+def _names(path):
+    with sqlite3.connect(str(path)) as connection:
+        return [name for name, in connection.execute('SELECT name FROM "Venue" ORDER BY id')]
+
+VENUE_FORM = {'name': 'Edited', 'city': 'San Francisco', 'state': 'CA', 'address': '1015 Folsom Street',
+              'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/TheMusicalHop'}
+
+def test_get_reads_from_the_replica(client, venue):
+    assert b'Original' in client.get('/venues/{}'.format(venue)).data
+    assert b'Original' in client.get('/api/v1/venues/{}'.format(venue)).data
+
+def test_replica_reads_post_reads_from_the_replica(client, venue):
+    response = client.post('/venues/search', data={'search_term': 'Original'})
+    assert b'Original' in response.data
+
+def test_writes_go_to_the_primary(client, venue, tmp_path):
+    response = client.post('/venues/{}/edit'.format(venue), data=VENUE_FORM, follow_redirects=True)
+    # the redirect after the write carries a flashed message, so it reads
+    # the primary and shows the edit
+    assert b'Edited' in response.data
+    assert _names(tmp_path / 'fyyur.db') == ['Edited']
+    assert _names(tmp_path / 'replica.db') == ['Original']
+    # plain GETs are back on the lagging replica
+    assert b'Original' in client.get('/venues/{}'.format(venue)).data
+
+def test_flush_inside_a_get_goes_to_the_primary(app, venue, tmp_path):
+    with app.test_request_context('/venues', method='GET'):
+        assert db.session.query(Venue.name).scalar() == 'Original'
+        db.session.add(Venue(name='Flushed', city='Oakland', state='CA', address='1 Broadway'))
+        db.session.flush()
+        db.session.commit()
+    assert _names(tmp_path / 'fyyur.db') == ['Primary', 'Flushed']
+    assert _names(tmp_path / 'replica.db') == ['Original']
+
+def test_outside_a_request_everything_uses_the_primary(venue):
+    assert db.session.query(Venue.name).scalar() == 'Primary'
+
+def test_free_slots_read_the_windows_from_the_primary(client, venue):
+    # opened after the replica was copied
+    db.session.add(Availability(venue_id=venue, start_time=datetime(2035, 1, 1, 18), end_time=datetime(2035, 1, 1, 23)))
+    db.session.commit()
+    db.session.remove()
+    response = client.get('/api/v1/venues/{}/free-slots?start=2035-01-01T00:00:00&end=2035-01-02T00:00:00'.format(venue))
+    assert response.status_code == 200
+    assert response.get_json()['data'] == [{'start': '2035-01-01T18:00:00', 'end': '2035-01-01T23:00:00'}]
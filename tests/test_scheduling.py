@@ -0,0 +1,93 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from models import db, Show, Availability
+from scheduling import IntervalTree, booking_errors, free_slots
+
+#  IntervalTree
+#  ----------------------------------------------------------------
+
+def test_interval_tree_matches_a_scan():
+    rng = random.Random(7)
+    tree, intervals = IntervalTree(), set()
+    for key in range(500):
+        start = rng.randrange(1000)
+        interval = (start, start + rng.randrange(1, 50), key)
+        tree.add(*interval)
+        intervals.add(interval)
+    for interval in rng.sample(sorted(intervals), 200):
+        tree.discard(*interval)
+        intervals.discard(interval)
+    tree.discard(5, 6, 'never added')
+    assert len(tree) == len(intervals)
+    for _ in range(300):
+        start = rng.randrange(1050)
+        end = start + rng.randrange(1, 60)
+        expected = sorted(interval for interval in intervals if interval[0] < end and interval[1] > start)
+        assert tree.overlapping(start, end) == expected
+
+def test_interval_tree_is_half_open():
+    tree = IntervalTree()
+    tree.add(10, 20, 'a')
+    assert tree.overlapping(0, 10) == []
+    assert tree.overlapping(20, 30) == []
+    assert tree.overlapping(19, 21) == [(10, 20, 'a')]
+
+#  Checks
+#  ----------------------------------------------------------------
+
+@pytest.fixture(params=[1024, 0], ids=['trees', 'queries'])
+def config(request, config):
+    config['SCHEDULE_INDEX_MAX_OWNERS'] = request.param
+    return config
+
+def test_booking_errors(make_venue, make_artist, make_show, soon):
+    venue, artist, other = make_venue(), make_artist(), make_artist(name='Other')
+    show = make_show(venue, artist, soon)
+    assert booking_errors(venue.id, other.id, soon - timedelta(hours=2), soon) == []
+    assert booking_errors(venue.id, other.id, soon + timedelta(hours=2), soon + timedelta(hours=3)) == []
+    assert booking_errors(venue.id, artist.id, soon + timedelta(hours=1), soon + timedelta(hours=3)) == [
+        'The venue is already booked at that time (show {}).'.format(show.id),
+        'The artist is already booked at that time (show {}).'.format(show.id),
+    ]
+
+def test_booking_errors_follow_commits(make_venue, make_artist, make_show, soon):
+    venue, artist, other = make_venue(), make_artist(), make_artist(name='Other')
+    assert booking_errors(venue.id, other.id, soon, soon + timedelta(hours=1)) == []
+    show = make_show(venue, artist, soon)
+    assert booking_errors(venue.id, other.id, soon, soon + timedelta(hours=1)) == \
+        ['The venue is already booked at that time (show {}).'.format(show.id)]
+    db.session.delete(show)
+    db.session.commit()
+    assert booking_errors(venue.id, other.id, soon, soon + timedelta(hours=1)) == []
+
+def test_booking_errors_with_windows(make_venue, make_artist, soon):
+    venue, artist = make_venue(), make_artist()
+    db.session.add(Availability(venue_id=venue.id, start_time=soon, end_time=soon + timedelta(hours=4)))
+    db.session.commit()
+    assert booking_errors(venue.id, artist.id, soon + timedelta(hours=1), soon + timedelta(hours=4)) == []
+    assert booking_errors(venue.id, artist.id, soon + timedelta(hours=3), soon + timedelta(hours=5)) == \
+        ['The venue is not available at that time.']
+
+def test_free_slots(make_venue, make_artist, make_show, soon):
+    venue = make_venue()
+    make_show(venue, make_artist(), soon + timedelta(hours=2))
+    assert free_slots(venue.id, soon, soon + timedelta(hours=8), timedelta(hours=1)) == [
+        (soon, soon + timedelta(hours=2)),
+        (soon + timedelta(hours=4), soon + timedelta(hours=8)),
+    ]
+
+def test_other_workers_bookings(app, make_venue, make_artist, soon):
+    # a show committed by another process, past this one's session
+    venue, artist, other = make_venue(), make_artist(), make_artist(name='Other')
+    assert booking_errors(venue.id, other.id, soon, soon + timedelta(hours=1)) == []
+    with db.engine.begin() as connection:
+        connection.execute(Show.__table__.insert().values(
+            venue_id=venue.id, artist_id=artist.id, start_time=soon, end_time=soon + timedelta(hours=2),
+            upcoming=True, updated_at=datetime.utcnow()))
+    errors = booking_errors(venue.id, other.id, soon, soon + timedelta(hours=1))
+    if app.config['SCHEDULE_INDEX_MAX_OWNERS']:
+        # the documented limit of the in-process trees
+        assert errors == []
+    else:
+        assert errors == ['The venue is already booked at that time (show 1).']
@@ -0,0 +1,89 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from sqlalchemy import event
+from models import db, Show, Availability
+from scheduling import batch_errors
+from forms import ShowForm
+
+@contextmanager
+def count_queries():
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+def _post_batch(client, *lines):
+    return client.post('/shows/create-batch', data={'rows': '\n'.join(lines)})
+
+def test_batch_lists_every_show(client, make_venue, make_artist, soon):
+    venue, artist = make_venue(), make_artist()
+    response = _post_batch(client,
+        '{},{},{}'.format(artist.id, venue.id, soon.isoformat(' ')),
+        '{},{},{},60'.format(artist.id, venue.id, (soon + timedelta(hours=3)).isoformat(' ')))
+    assert b'2 shows were successfully listed' in response.data
+    assert [show.end_time - show.start_time for show in Show.query.order_by(Show.start_time)] == \
+        [timedelta(minutes=120), timedelta(minutes=60)]
+
+def test_batch_row_without_start_time_is_rejected(client, make_venue, make_artist):
+    venue, artist = make_venue(), make_artist()
+    for row in ('{},{}', '{},{},'):
+        response = _post_batch(client, row.format(artist.id, venue.id))
+        assert b'could not be listed' in response.data
+        assert b'start_time' in response.data
+    assert Show.query.count() == 0
+
+def test_batch_is_all_or_nothing(client, make_venue, make_artist, soon):
+    venue, artist = make_venue(), make_artist()
+    response = _post_batch(client,
+        '{},{},{}'.format(artist.id, venue.id, soon.isoformat(' ')),
+        '{},{},{}'.format(artist.id, venue.id + 1, soon.isoformat(' ')))
+    assert b'1 of 2 rows have errors' in response.data
+    assert Show.query.count() == 0
+
+def test_oversized_batch_is_rejected_before_validation(app, client, make_venue, make_artist, soon, monkeypatch):
+    app.config['SHOW_BATCH_MAX_ROWS'] = 2
+    venue, artist = make_venue(), make_artist()
+    def validate(form, extra_validators=None):
+        raise AssertionError('a row was validated')
+    monkeypatch.setattr(ShowForm, 'validate', validate)
+    response = _post_batch(client, *['{},{},{}'.format(artist.id, venue.id, (soon + timedelta(days=day)).isoformat(' '))
+                                     for day in range(3)])
+    assert b'at most 2 rows' in response.data
+    assert Show.query.count() == 0
+
+def test_batch_errors(make_venue, make_artist, make_show, soon):
+    venue, artist, other = make_venue(), make_artist(), make_artist(name='Other')
+    booked = make_show(venue, other, soon)
+    closed = make_venue(name='Closed')
+    db.session.add(Availability(venue_id=closed.id, start_time=soon, end_time=soon + timedelta(hours=4)))
+    db.session.commit()
+    rows = {
+        1: {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': soon + timedelta(hours=1), 'end_time': soon + timedelta(hours=3)},
+        2: {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': soon + timedelta(hours=4), 'end_time': soon + timedelta(hours=6)},
+        3: {'venue_id': closed.id, 'artist_id': other.id, 'start_time': soon + timedelta(hours=3), 'end_time': soon + timedelta(hours=5)},
+        4: {'venue_id': closed.id, 'artist_id': artist.id, 'start_time': soon + timedelta(hours=5), 'end_time': soon + timedelta(hours=7)},
+        5: {'venue_id': venue.id, 'artist_id': artist.id + 99, 'start_time': soon, 'end_time': soon + timedelta(hours=1)},
+    }
+    assert batch_errors(rows) == {
+        1: ['The venue is already booked at that time (show {}).'.format(booked.id)],
+        3: ['The venue is not available at that time.'],
+        4: ['The venue is not available at that time.', 'The artist is also booked at that time on line 2.'],
+        5: ['Unknown artist {}.'.format(artist.id + 99)],
+    }
+
+def test_batch_errors_query_count_does_not_grow_with_the_batch(make_venue, make_artist, soon):
+    venues = [make_venue(name='Venue {}'.format(i)).id for i in range(20)]
+    artists = [make_artist(name='Artist {}'.format(i)).id for i in range(20)]
+    def rows(n):
+        return {line: {'venue_id': venues[line % 20], 'artist_id': artists[line % 20],
+                       'start_time': soon + timedelta(days=line), 'end_time': soon + timedelta(days=line, hours=2)}
+                for line in range(n)}
+    with count_queries() as small:
+        assert batch_errors(rows(2)) == {}
+    with count_queries() as large:
+        assert batch_errors(rows(200)) == {}
+    assert len(large) == len(small) <= 8
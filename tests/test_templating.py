@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+import babel.dates
+import pytest
+from templating import format_datetime
+
+WHEN = datetime(2019, 5, 21, 21, 30)
+
+def test_app_formats():
+    assert format_datetime(WHEN.isoformat(), 'full') == 'Tuesday May, 21, 2019 at 9:30PM'
+    assert format_datetime(WHEN.isoformat() + 'Z') == 'Tue 05, 21, 2019 9:30PM'
+
+@pytest.mark.parametrize('format', ['short', 'long'])
+def test_babel_named_formats(format):
+    expected = babel.dates.format_datetime(WHEN.replace(tzinfo=timezone.utc), format, tzinfo=timezone.utc, locale='en')
+    assert format_datetime(WHEN, format) == expected
+
+def test_pattern():
+    assert format_datetime(WHEN, 'yyyy-MM-dd HH:mm') == '2019-05-21 21:30'
@@ -0,0 +1,127 @@
+from datetime import datetime
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, current_app
+from sqlalchemy.exc import SQLAlchemyError
+from forms import VenueForm, model_values
+from models import db, Venue, Artist
+from search import search_names
+from queries import live, genre_names, venue_areas, venue_detail, venue_version
+from pagination import Keyset
+from cache import cache, entity_tags
+from conditional import versioned
+from routing import replica_reads
+from geo import nearby_args, nearby_venues
+from purge import start_purge
+
+#----------------------------------------------------------------------------#
+# Venue pages.
+#----------------------------------------------------------------------------#
+
+venues = Blueprint('venues', __name__)
+
+#  Listing and search
+#  ----------------------------------------------------------------
+
+@venues.route('/venues')
+@cache.cached('Venue', 'Show')
+def index():
+    genre = request.args.get('genre')
+    page = venue_areas(Keyset.from_request(current_app.config['PAGE_SIZE']), genre=genre)
+    return render_template('pages/venues.html', areas=page.items, page=page, genre=genre)
+
+@venues.route('/venues/search', methods=['POST'])
+@replica_reads
+def search_venues():
+    # case-insensitive partial match on venue name, e.g. "Hop" -> "The Musical Hop"
+    search_term = request.form.get('search_term', '')
+    response = search_names(Venue, search_term, genre=request.form.get('genre'))
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@venues.route('/venues/nearby')
+@cache.cached('Venue', 'Show')
+def nearby():
+    # ?lat=37.77&lng=-122.42&radius=25 or ?bbox=west,south,east,north
+    try:
+        query = nearby_args(request.args)
+    except (KeyError, ValueError):
+        abort(400)
+    return render_template('pages/nearby_venues.html', results=nearby_venues(**query), query=query)
+
+@venues.route('/venues/<int:venue_id>')
+@versioned(venue_version)
+@cache.cached('Venue:{venue_id}', 'Venue:*', 'Artist:*')
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    data = venue_detail(venue_id)
+    if data is None:
+        abort(404)
+    for show in data['upcoming_shows'] + data['past_shows']:
+        cache.add_tags(*entity_tags(Artist, show['artist_id']))
+    return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@venues.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+@venues.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    form = VenueForm(request.form)
+    if not form.validate():
+        flash('An error occurred. Venue ' + request.form.get('name', '') + ' could not be listed.')
+        return render_template('forms/new_venue.html', form=form)
+    venue = Venue(**model_values(form))
+    try:
+        db.session.add(venue)
+        db.session.commit()
+        flash('Venue ' + venue.name + ' was successfully listed!')
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception('could not create venue')
+        flash('An error occurred. Venue ' + form.name.data + ' could not be listed.')
+    return render_template('pages/home.html')
+
+@venues.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    # hides the venue at once; its shows and then the venue itself are
+    # deleted in batches in the background (purge.py)
+    venue = Venue.query.filter(Venue.id == venue_id, live(Venue)).first_or_404()
+    try:
+        venue.deleted_at = datetime.utcnow()
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception('could not delete venue %s', venue_id)
+        return {'id': venue_id, 'deleted': False}, 500
+    start_purge(venue_id)
+    return {'id': venue_id, 'deleted': True}, 202
+
+#  Update
+#  ----------------------------------------------------------------
+
+@venues.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    venue = Venue.query.filter(Venue.id == venue_id, live(Venue)).first_or_404()
+    form = VenueForm(obj=venue)
+    form.genres.data = genre_names(venue)
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@venues.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    venue = Venue.query.filter(Venue.id == venue_id, live(Venue)).first_or_404()
+    form = VenueForm(request.form)
+    if not form.validate():
+        flash('An error occurred. Venue ' + venue.name + ' could not be updated.')
+        return render_template('forms/edit_venue.html', form=form, venue=venue)
+    try:
+        for name, value in model_values(form).items():
+            setattr(venue, name, value)
+        db.session.commit()
+        flash('Venue ' + venue.name + ' was successfully updated!')
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception('could not update venue %s', venue_id)
+        flash('An error occurred. Venue ' + form.name.data + ' could not be updated.')
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))